@@ -0,0 +1,73 @@
+"""
+Cart edit throughput with baskets in postgres vs. redis with write-behind.
+
+Needs running postgres and redis from config and at least one product in the store.
+Run from src directory:
+    python -m benchmarks.basket_storage --edits 2000 --users 100 --concurrency 50
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+import sqlalchemy as _sql
+
+from redis_db.connect import redis_client
+from services.basket.storage import BasketStorage, PostgresBasketStorage, RedisBasketStorage
+from sql.connect import AsyncSessionLocal, async_engine
+from sql.models import Product
+
+
+async def pick_product() -> uuid.UUID:
+    async with AsyncSessionLocal() as session:
+        product_id = (await session.execute(_sql.select(Product.id).limit(1))).scalar()
+    if product_id is None:
+        raise SystemExit('Store is empty, create a product first')
+    return product_id
+
+
+async def cart_edits(storage: BasketStorage, product_id: uuid.UUID, users: list[uuid.UUID],
+                     edits: int, concurrency: int) -> float:
+    """ Each user adds the product once, the rest of edits increment random baskets """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def edit(user_id: uuid.UUID) -> None:
+        async with semaphore:
+            await storage.add(user_id, product_id)
+
+    await asyncio.gather(*(edit(user_id) for user_id in users))
+    started = time.perf_counter()
+    await asyncio.gather(*(edit(random.choice(users)) for _ in range(edits)))
+    return time.perf_counter() - started
+
+
+async def run(name: str, storage: BasketStorage, product_id: uuid.UUID, args: argparse.Namespace) -> None:
+    users = [uuid.uuid4() for _ in range(args.users)]
+    elapsed = await cart_edits(storage, product_id, users, args.edits, args.concurrency)
+    line = f'{name:<9} {args.edits / elapsed:9.0f} edits/s  total {elapsed:6.2f}s'
+    if isinstance(storage, RedisBasketStorage):
+        started = time.perf_counter()
+        flushed = await storage.flush()
+        line += f'  | flush of {flushed} baskets {time.perf_counter() - started:6.2f}s'
+    print(line)
+    for user_id in users:
+        await storage.clear(user_id)
+    if isinstance(storage, RedisBasketStorage):
+        await storage.flush()
+
+
+async def main(args: argparse.Namespace) -> None:
+    product_id = await pick_product()
+    await run('postgres', PostgresBasketStorage(), product_id, args)
+    await run('redis', RedisBasketStorage(), product_id, args)
+    await async_engine.dispose()
+    await redis_client.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--edits', type=int, default=2000, help='Cart edits to measure')
+    parser.add_argument('--users', type=int, default=100, help='Baskets the edits are spread over')
+    parser.add_argument('--concurrency', type=int, default=50, help='Edits in flight at once')
+    asyncio.run(main(parser.parse_args()))
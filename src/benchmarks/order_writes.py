@@ -0,0 +1,85 @@
+"""
+Order write throughput, insert_one per order vs. the batching write buffer.
+
+Needs running mongo from config. Orders are written for a benchmark user and deleted afterwards.
+Run from src directory:
+    python -m benchmarks.order_writes --orders 5000 --concurrency 500
+"""
+import argparse
+import asyncio
+import datetime
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+from mongo.connect import close_mongo, connect_mongo
+from mongo.crud import MongoCRUD
+from services.basket.schemas import FullBasketSchema, ProductInfoFromBasket
+from services.orders.schemas import OrderSchema
+from services.orders.utils import make_order_document
+from services.orders.writer import OrderWriteBuffer
+from services.store.schemas import ProductReadSchema
+
+
+def make_order(username: str, items: int) -> OrderSchema:
+    lines = [ProductInfoFromBasket(item=ProductReadSchema(id=uuid.uuid4(), title=f'Product {number}', description=None,
+                                                          price=10.5, image=f'image-{number}.png',
+                                                          created_at=datetime.datetime.utcnow(),
+                                                          categories_id=uuid.uuid4()),
+                                   quantity=2, unit_price=Decimal('10.50'), full_summa=Decimal('21.00'))
+             for number in range(items)]
+    basket = FullBasketSchema(full_summa=sum(line.full_summa for line in lines), items=lines)
+    return OrderSchema.from_basket(basket, username=username, post_index=10001)
+
+
+async def insert_one_per_order(order: OrderSchema) -> None:
+    await MongoCRUD.create(make_order_document(order))
+
+
+async def measure(write, orders: list[OrderSchema], concurrency: int) -> tuple[float, list[float]]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def place(order: OrderSchema) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await write(order)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(place(order) for order in orders))
+    return time.perf_counter() - started, latencies
+
+
+def report(name: str, orders: int, elapsed: float, latencies: list[float]) -> None:
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    print(f'{name:<10} {orders / elapsed:9.0f} orders/s  total {elapsed:6.2f}s | latency ms: '
+          f'mean {statistics.mean(latencies_ms):7.2f}  p99 {latencies_ms[int(len(latencies_ms) * 0.99)]:7.2f}')
+
+
+async def main(args: argparse.Namespace) -> None:
+    connect_mongo()
+    username = f'benchmark-{uuid.uuid4()}'
+    buffer = OrderWriteBuffer()
+    await buffer.start()
+    try:
+        orders = [make_order(username, args.items) for _ in range(args.orders)]
+        report('insert_one', args.orders, *await measure(insert_one_per_order, orders, args.concurrency))
+        orders = [make_order(username, args.items) for _ in range(args.orders)]
+        report('buffered', args.orders,
+               *await measure(lambda order: buffer.write(make_order_document(order)), orders, args.concurrency))
+        print(f'buffered   {buffer.get_statistics()["average_batch_size"]:.1f} orders per insert_many')
+    finally:
+        await buffer.stop()
+        async with MongoCRUD.get_mongo_collection() as collection:
+            await collection.delete_many({'username': username})
+        close_mongo()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--items', type=int, default=3, help='Products in every order')
+    parser.add_argument('--concurrency', type=int, default=200, help='Orders placed at the same time')
+    asyncio.run(main(parser.parse_args()))
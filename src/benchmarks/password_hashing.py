@@ -0,0 +1,69 @@
+"""
+Event loop latency under a login storm, bcrypt inline vs. in the process pool.
+
+Run from src directory:
+    python -m benchmarks.password_hashing --logins 100
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import config
+from services.auth.utils import get_password_hash, verify_password, verify_and_update_password, \
+    shutdown_password_hash_executor
+
+TICK_SECONDS = 0.005
+
+
+async def measure_loop_lag(stop: asyncio.Event, lags: list[float]) -> None:
+    """ Sleeps for a short tick and records how late the loop woke it up """
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(time.perf_counter() - started - TICK_SECONDS)
+
+
+async def inline_login(password: str, hashed_password: str) -> bool:
+    return verify_password(password, hashed_password)
+
+
+async def offloaded_login(password: str, hashed_password: str) -> bool:
+    verify, _ = await verify_and_update_password(password, hashed_password)
+    return verify
+
+
+async def login_storm(login, logins: int, hashed_password: str) -> tuple[float, list[float]]:
+    stop = asyncio.Event()
+    lags: list[float] = []
+    ticker = asyncio.create_task(measure_loop_lag(stop, lags))
+    await asyncio.sleep(TICK_SECONDS * 2)
+    started = time.perf_counter()
+    await asyncio.gather(*(login('Password1', hashed_password) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+    return elapsed, lags
+
+
+def report(name: str, elapsed: float, lags: list[float]) -> None:
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    print(f'{name:<10} total {elapsed:7.2f}s | loop lag ms: '
+          f'mean {statistics.mean(lags_ms):8.2f}  p99 {lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))]:8.2f}  '
+          f'max {lags_ms[-1]:8.2f}  ticks {len(lags_ms)}')
+
+
+async def main(logins: int) -> None:
+    hashed_password = get_password_hash('Password1')
+    # Start worker processes before measuring
+    await asyncio.gather(*(offloaded_login('Password1', hashed_password)
+                           for _ in range(config.PASSWORD_HASH_WORKERS)))
+    report('inline', *await login_storm(inline_login, logins, hashed_password))
+    report('offloaded', *await login_storm(offloaded_login, logins, hashed_password))
+    shutdown_password_hash_executor()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--logins', type=int, default=50, help='Concurrent logins in the storm')
+    asyncio.run(main(parser.parse_args().logins))
@@ -0,0 +1,84 @@
+"""
+CPU time to turn a page of fetched products into a JSON response body.
+
+before: ORM objects -> make_products_read_schema -> response_model validation -> jsonable_encoder -> JSONResponse
+after:  Core rows of PRODUCT_READ_COLUMNS -> rows_as_dicts -> FastJSONResponse
+
+Database time is left out, both paths start from already fetched rows.
+Run from src directory:
+    python -m benchmarks.serialization --rows 1000 --repeat 50
+"""
+import argparse
+import asyncio
+import datetime
+import time
+import uuid
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy.engine.result import result_tuple
+
+from responses import FastJSONResponse
+from services.store.schemas import ProductPageSchema
+from services.store.utils import make_products_read_schema
+from sql.crud import PRODUCT_READ_COLUMNS, rows_as_dicts
+from sql.models import Product
+
+
+def make_data(rows: int) -> tuple[list[Product], list]:
+    """ Same products as ORM objects (numeric prices) and as Core rows (float prices) """
+    category_id = uuid.uuid4()
+    make_row = result_tuple([column.name for column in PRODUCT_READ_COLUMNS])
+    orm_products, core_rows = [], []
+    for number in range(rows):
+        product = Product(id=uuid.uuid4(), title=f'Product {number}', description='Some description ' * 5,
+                          price=Decimal('199.99'), image=f'https://storage/{number}', discount=number % 3 * 10 or None,
+                          created_at=datetime.datetime.utcnow(), categories_id=category_id)
+        orm_products.append(product)
+        price_with_discount = float(round(product.price * (100 - product.discount) / 100, 2)) \
+            if product.discount else None
+        core_rows.append(make_row((product.id, product.title, product.description, float(product.price),
+                                   product.image, product.discount, product.created_at, product.categories_id,
+                                   price_with_discount)))
+    return orm_products, core_rows
+
+
+async def before(orm_products: list[Product], response_field) -> bytes:
+    page = ProductPageSchema(items=[make_products_read_schema(product) for product in orm_products])
+    content = await serialize_response(field=response_field, response_content=page)
+    return JSONResponse(content).body
+
+
+async def after(core_rows: list) -> bytes:
+    page = {'items': rows_as_dicts(core_rows, PRODUCT_READ_COLUMNS), 'next_cursor': None}
+    return FastJSONResponse(page).body
+
+
+async def measure(name: str, page_coroutine, repeat: int) -> float:
+    await page_coroutine()  # Warm up
+    started = time.process_time()
+    for _ in range(repeat):
+        await page_coroutine()
+    cpu_ms = (time.process_time() - started) / repeat * 1000
+    print(f'{name:<7} {cpu_ms:8.2f} ms CPU per page')
+    return cpu_ms
+
+
+async def main(rows: int, repeat: int) -> None:
+    orm_products, core_rows = make_data(rows)
+    response_field = create_response_field(name='Response_get_products', type_=ProductPageSchema,
+                                           mode='serialization')
+    print(f'{rows} rows per page, {repeat} pages')
+    before_ms = await measure('before', lambda: before(orm_products, response_field), repeat)
+    after_ms = await measure('after', lambda: after(core_rows), repeat)
+    print(f'speedup {before_ms / after_ms:.1f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000, help='Products in one page')
+    parser.add_argument('--repeat', type=int, default=50, help='Pages to render')
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
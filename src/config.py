@@ -10,20 +10,68 @@ DB_PASS = os.getenv('DB_PASS')
 DB_HOST = os.getenv('DB_HOST')
 DB_PORT = os.getenv('DB_PORT')
 
+DB_ECHO = os.getenv('DB_ECHO', 'False').lower() == 'true'
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'True').lower() == 'true'
+DB_CONNECT_TIMEOUT = float(os.getenv('DB_CONNECT_TIMEOUT', 10))
+DB_COMMAND_TIMEOUT = float(os.getenv('DB_COMMAND_TIMEOUT', 60))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', 100))
+
 MONGO_CONNECT = os.getenv('MONGO_CONNECT')
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 300000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 10000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 10000))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 10000))
+ORDER_WRITERS = int(os.getenv('ORDER_WRITERS', 2))  # Batches written to mongo at the same time
+ORDER_BATCH_SIZE = int(os.getenv('ORDER_BATCH_SIZE', 500))
+ORDER_FLUSH_INTERVAL_SECONDS = float(os.getenv('ORDER_FLUSH_INTERVAL_SECONDS', 0.005))  # Longest wait to fill a batch
+ORDER_QUEUE_SIZE = int(os.getenv('ORDER_QUEUE_SIZE', 10000))
+ORDER_WRITE_CONCERN = os.getenv('ORDER_WRITE_CONCERN', 'majority')
+ORDER_WRITE_JOURNAL = os.getenv('ORDER_WRITE_JOURNAL', 'True').lower() == 'true'
+ORDER_EXPORT_BATCH_SIZE = int(os.getenv('ORDER_EXPORT_BATCH_SIZE', 1000))  # Orders fetched and sent as one chunk
 
 REDIS_HOST = os.getenv('REDIS_HOST')
 REDIS_PORT = os.getenv('REDIS_PORT')
 
+BASKET_STORAGE = os.getenv('BASKET_STORAGE', 'postgres')  # 'postgres' or 'redis' (write-behind to postgres)
+BASKET_FLUSH_INTERVAL_SECONDS = float(os.getenv('BASKET_FLUSH_INTERVAL_SECONDS', 1))
+BASKET_FLUSH_BATCH_SIZE = int(os.getenv('BASKET_FLUSH_BATCH_SIZE', 500))
+
 JWT_SECRET_TOKEN = os.getenv('JWT_SECRET_TOKEN')
 ADMIN_SECRET = os.getenv('ADMIN_SECRET')
 
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+PASSWORD_HASH_CONCURRENCY = int(os.getenv('PASSWORD_HASH_CONCURRENCY', 2 * (os.cpu_count() or 1)))
+
 
 EMAIL_ADDRESS = os.getenv('EMAIL_ADDRESS')
 EMAIL_PASS = os.getenv('EMAIL_PASS')
+SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', 465))
+SMTP_USE_SSL = os.getenv('SMTP_USE_SSL', 'True').lower() == 'true'
+SMTP_TIMEOUT = float(os.getenv('SMTP_TIMEOUT', 30))
+EMAIL_WORKERS = int(os.getenv('EMAIL_WORKERS', 2))
+EMAIL_QUEUE_SIZE = int(os.getenv('EMAIL_QUEUE_SIZE', 1000))
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', 50))  # Queued messages sent by a worker over one SMTP session
+EMAIL_MAX_RETRIES = int(os.getenv('EMAIL_MAX_RETRIES', 3))
+EMAIL_RETRY_BACKOFF_SECONDS = float(os.getenv('EMAIL_RETRY_BACKOFF_SECONDS', 1))
 
 
 S3_ACCESS_KEY = os.getenv('S3_ACCESS_KEY')
 S3_SECRET_KEY = os.getenv('S3_SECRET_KEY')
 S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')
-S3_BUCKET_NAME = os.getenv('S3_BUCKET_NAME')
\ No newline at end of file
+S3_BUCKET_NAME = os.getenv('S3_BUCKET_NAME')
+S3_ADDRESSING_STYLE = os.getenv('S3_ADDRESSING_STYLE', 'path')  # path style works with MinIO and other local stand-ins
+S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', 10))
+S3_MULTIPART_CHUNK_SIZE = int(os.getenv('S3_MULTIPART_CHUNK_SIZE', 8 * 1024 * 1024))  # S3 minimum part is 5 MiB
+
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 1000))  # Rows loaded by one COPY
+IMPORT_IMAGE_CONCURRENCY = int(os.getenv('IMPORT_IMAGE_CONCURRENCY', S3_MAX_POOL_CONNECTIONS))
+IMPORT_IMAGE_TIMEOUT_SECONDS = float(os.getenv('IMPORT_IMAGE_TIMEOUT_SECONDS', 30))
+IMPORT_IMAGES_DIR = os.getenv('IMPORT_IMAGES_DIR')  # Local image paths of imports resolve inside it, unset forbids them
@@ -1,7 +1,6 @@
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 
-from redis import asyncio as aioredis
 from fastapi_cache import FastAPICache
 from fastapi_cache.backends.redis import RedisBackend
 from fastapi_cache.decorator import cache
@@ -9,24 +8,47 @@ from fastapi_cache.decorator import cache
 from fastapi import FastAPI, APIRouter
 
 from services.auth.router import router as users_routers
+from services.auth.utils import shutdown_password_hash_executor
 from services.store.category_router import router as categories_router
 from services.store.product_router import router as products_router
 from services.email.router import router as email_router
 from services.basket.router import router as basket_router
 from services.orders.router import router as order_router
+from services.metrics.router import router as metrics_router
+from sql.connect import async_engine
+from redis_db.connect import redis_client
+from mongo.connect import connect_mongo, close_mongo
+from mongo.crud import MongoCRUD
+from services.S3_Storage.storage import s3_client
+from services.email.delivery import email_delivery
+from services.basket.storage import basket_storage
+from services.orders.writer import order_write_buffer
 
 store_routers = APIRouter(prefix='/store')
 store_routers.include_router(categories_router)
 store_routers.include_router(products_router)
 
-routers = [users_routers, email_router, store_routers, basket_router, order_router]
+routers = [users_routers, email_router, store_routers, basket_router, order_router, metrics_router]
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI) -> AsyncIterator[None]:
-    redis = aioredis.from_url("redis://localhost")
-    FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+    FastAPICache.init(RedisBackend(redis_client), prefix="fastapi-cache")
+    connect_mongo()
+    await MongoCRUD.create_indexes()
+    await s3_client.start()
+    await email_delivery.start()
+    await basket_storage.start()
+    await order_write_buffer.start()
     yield
+    await order_write_buffer.stop()
+    await basket_storage.stop()
+    await email_delivery.stop()
+    await s3_client.close()
+    close_mongo()
+    await async_engine.dispose()
+    await redis_client.close()
+    shutdown_password_hash_executor()
 
 
 app = FastAPI(debug=False, title="API Service for shop", openapi_prefix='/api', lifespan=lifespan)
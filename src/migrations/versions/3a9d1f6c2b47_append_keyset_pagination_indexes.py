@@ -0,0 +1,28 @@
+"""Append keyset pagination indexes
+
+Revision ID: 3a9d1f6c2b47
+Revises: fe4d31a2689e
+Create Date: 2026-10-18 10:12:41.381204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a9d1f6c2b47'
+down_revision: Union[str, None] = 'fe4d31a2689e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_store_created_at_id', 'store', ['created_at', 'id'], unique=False)
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_created_at_id', table_name='users')
+    op.drop_index('ix_store_created_at_id', table_name='store')
@@ -0,0 +1,34 @@
+"""Drop verification codes table, codes are kept in redis
+
+Revision ID: 7c2e5b9a1d04
+Revises: 3a9d1f6c2b47
+Create Date: 2026-10-18 13:27:05.918342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e5b9a1d04'
+down_revision: Union[str, None] = '3a9d1f6c2b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_table('verification_codes')
+
+
+def downgrade() -> None:
+    op.create_table(
+        'verification_codes',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True, unique=True, nullable=False),
+        sa.Column('verify_code', sa.DECIMAL(6, 0), nullable=False),
+        sa.Column('users_id', postgresql.UUID(), nullable=True),
+        sa.Column('expire_to', sa.DateTime, nullable=True),
+    )
+    op.create_index(op.f('ix_verification_codes_users_id'), 'verification_codes', ['users_id'], unique=False)
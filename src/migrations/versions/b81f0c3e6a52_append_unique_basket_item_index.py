@@ -0,0 +1,43 @@
+"""Append unique basket item index
+
+Revision ID: b81f0c3e6a52
+Revises: 7c2e5b9a1d04
+Create Date: 2026-10-18 14:05:33.207915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81f0c3e6a52'
+down_revision: Union[str, None] = '7c2e5b9a1d04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Merge rows duplicated by concurrent inserts into the oldest one before the index makes them impossible
+    op.execute(sa.text("""
+        WITH duplicates AS (
+            SELECT id,
+                   sum(quantity) OVER (PARTITION BY users_id, products_id) AS total_quantity,
+                   row_number() OVER (PARTITION BY users_id, products_id ORDER BY ctid) AS position
+            FROM baskets
+        ), merged AS (
+            UPDATE baskets SET quantity = duplicates.total_quantity
+            FROM duplicates
+            WHERE baskets.id = duplicates.id AND duplicates.position = 1
+        )
+        DELETE FROM baskets USING duplicates
+        WHERE baskets.id = duplicates.id AND duplicates.position > 1
+    """))
+    op.create_index('ix_baskets_users_id_products_id', 'baskets', ['users_id', 'products_id'], unique=True)
+    op.drop_index(op.f('ix_baskets_users_id'), table_name='baskets')
+
+
+def downgrade() -> None:
+    op.create_index(op.f('ix_baskets_users_id'), 'baskets', ['users_id'], unique=False)
+    op.drop_index('ix_baskets_users_id_products_id', table_name='baskets')
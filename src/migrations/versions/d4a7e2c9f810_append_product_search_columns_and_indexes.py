@@ -0,0 +1,45 @@
+"""Append product search columns and indexes
+
+Revision ID: d4a7e2c9f810
+Revises: b81f0c3e6a52
+Create Date: 2026-10-18 15:11:48.552610
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a7e2c9f810'
+down_revision: Union[str, None] = 'b81f0c3e6a52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.add_column('store', sa.Column(
+        'effective_price', sa.DECIMAL(9, 2),
+        sa.Computed('round(price * (100 - coalesce(discount, 0)) / 100, 2)', persisted=True)))
+    op.add_column('store', sa.Column(
+        'search_vector', postgresql.TSVECTOR(),
+        sa.Computed("setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+                    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')", persisted=True)))
+    op.create_index('ix_store_effective_price_id', 'store', ['effective_price', 'id'], unique=False)
+    op.create_index('ix_store_search_vector', 'store', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index('ix_store_title_trgm', 'store', ['title'], unique=False, postgresql_using='gin',
+                    postgresql_ops={'title': 'gin_trgm_ops'})
+    op.create_index('ix_store_description_trgm', 'store', ['description'], unique=False, postgresql_using='gin',
+                    postgresql_ops={'description': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_store_description_trgm', table_name='store')
+    op.drop_index('ix_store_title_trgm', table_name='store')
+    op.drop_index('ix_store_search_vector', table_name='store')
+    op.drop_index('ix_store_effective_price_id', table_name='store')
+    op.drop_column('store', 'search_vector')
+    op.drop_column('store', 'effective_price')
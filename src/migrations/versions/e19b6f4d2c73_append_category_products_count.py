@@ -0,0 +1,37 @@
+"""Append category products count
+
+Revision ID: e19b6f4d2c73
+Revises: d4a7e2c9f810
+Create Date: 2026-10-18 15:52:20.734116
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e19b6f4d2c73'
+down_revision: Union[str, None] = 'd4a7e2c9f810'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('categories', sa.Column('products_count', sa.Integer(), nullable=False, server_default='0'))
+    op.execute(sa.text("""
+        UPDATE categories SET products_count = counts.products_count
+        FROM (SELECT categories_id, count(*) AS products_count FROM store GROUP BY categories_id) AS counts
+        WHERE categories.id = counts.categories_id
+    """))
+    op.create_index('ix_store_categories_id_created_at_id', 'store', ['categories_id', 'created_at', 'id'],
+                    unique=False)
+    # Single column index from fe4d31a2689e is covered by the new one
+    op.drop_index(op.f('ix_store_categories_id'), table_name='store')
+
+
+def downgrade() -> None:
+    op.create_index(op.f('ix_store_categories_id'), 'store', ['categories_id'], unique=False)
+    op.drop_index('ix_store_categories_id_created_at_id', table_name='store')
+    op.drop_column('categories', 'products_count')
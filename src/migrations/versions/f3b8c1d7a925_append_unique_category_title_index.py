@@ -0,0 +1,50 @@
+"""Append unique category title index
+
+Revision ID: f3b8c1d7a925
+Revises: e19b6f4d2c73
+Create Date: 2026-10-18 17:41:09.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8c1d7a925'
+down_revision: Union[str, None] = 'e19b6f4d2c73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Categories duplicated by concurrent creates are merged into the oldest one with their products
+    op.execute(sa.text("""
+        CREATE TEMPORARY TABLE category_duplicates ON COMMIT DROP AS
+        SELECT id, first_value(id) OVER (PARTITION BY title ORDER BY created_at, id) AS keeper_id
+        FROM categories
+    """))
+    op.execute(sa.text("""
+        DELETE FROM category_duplicates WHERE id = keeper_id
+    """))
+    op.execute(sa.text("""
+        UPDATE store SET categories_id = category_duplicates.keeper_id
+        FROM category_duplicates
+        WHERE store.categories_id = category_duplicates.id
+    """))
+    op.execute(sa.text("""
+        DELETE FROM categories USING category_duplicates
+        WHERE categories.id = category_duplicates.id
+    """))
+    op.execute(sa.text("""
+        UPDATE categories SET products_count = (
+            SELECT count(*) FROM store WHERE store.categories_id = categories.id
+        )
+        WHERE categories.id IN (SELECT keeper_id FROM category_duplicates)
+    """))
+    op.create_index('ix_categories_title', 'categories', ['title'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_categories_title', table_name='categories')
@@ -0,0 +1,31 @@
+from decimal import Decimal
+
+from bson import Decimal128
+from bson.binary import UuidRepresentation
+from bson.codec_options import CodecOptions, TypeCodec, TypeEncoder, TypeRegistry
+
+from services.orders.utils import OrderStatus
+
+
+class DecimalCodec(TypeCodec):
+    """ Prices are kept exact as Decimal128 and come back as Decimal """
+    python_type = Decimal
+    bson_type = Decimal128
+
+    def transform_python(self, value: Decimal) -> Decimal128:
+        return Decimal128(value)
+
+    def transform_bson(self, value: Decimal128) -> Decimal:
+        return value.to_decimal()
+
+
+class OrderStatusEncoder(TypeEncoder):
+    python_type = OrderStatus
+
+    def transform_python(self, value: OrderStatus) -> str:
+        return value.value
+
+
+# UUIDs are stored as 16 byte binary (subtype 4) instead of 36 character strings
+ORDERS_CODEC_OPTIONS = CodecOptions(uuid_representation=UuidRepresentation.STANDARD,
+                                    type_registry=TypeRegistry([DecimalCodec(), OrderStatusEncoder()]))
@@ -0,0 +1,100 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from config import MONGO_CONNECT, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS, \
+    MONGO_CONNECT_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_WAIT_QUEUE_TIMEOUT_MS
+
+
+class MongoPoolStatistics(monitoring.ConnectionPoolListener):
+    """ Counters of the shared client connection pool, filled by pymongo pool events """
+
+    def __init__(self):
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.connections_created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.connections_closed += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+        self.checkouts += 1
+        wait_time = getattr(event, 'duration', None) or 0.0  # Reported by pymongo >= 4.7
+        self.total_wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+
+mongo_pool_statistics = MongoPoolStatistics()
+
+_mongo_client: AsyncIOMotorClient | None = None
+
+
+def connect_mongo() -> AsyncIOMotorClient:
+    """ Create the client shared by the whole worker, called once in application lifespan """
+    global _mongo_client
+    if _mongo_client is None:
+        _mongo_client = AsyncIOMotorClient(MONGO_CONNECT,
+                                           maxPoolSize=MONGO_MAX_POOL_SIZE,
+                                           minPoolSize=MONGO_MIN_POOL_SIZE,
+                                           maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+                                           connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+                                           serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                                           waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                                           event_listeners=[mongo_pool_statistics])
+    return _mongo_client
+
+
+def get_mongo_client() -> AsyncIOMotorClient:
+    return _mongo_client or connect_mongo()
+
+
+def close_mongo() -> None:
+    global _mongo_client
+    if _mongo_client is not None:
+        _mongo_client.close()
+        _mongo_client = None
+
+
+def get_mongo_pool_statistics() -> dict:
+    checkouts = mongo_pool_statistics.checkouts
+    return {
+        'max_pool_size': MONGO_MAX_POOL_SIZE,
+        'connections_created': mongo_pool_statistics.connections_created,
+        'connections_closed': mongo_pool_statistics.connections_closed,
+        'checked_out': mongo_pool_statistics.checked_out,
+        'checkouts': checkouts,
+        'checkout_failures': mongo_pool_statistics.checkout_failures,
+        'average_wait_time': mongo_pool_statistics.total_wait_time / checkouts if checkouts else 0.0,
+        'max_wait_time': mongo_pool_statistics.max_wait_time,
+    }
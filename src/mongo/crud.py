@@ -1,62 +1,157 @@
-import json
+import datetime
 import uuid
 from typing import AsyncIterator
 
 from fastapi import HTTPException
+from starlette import status as http_status
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument
+from pymongo.write_concern import WriteConcern
 
-from services.orders.schemas import OrderSchema
+from config import ORDER_WRITE_CONCERN, ORDER_WRITE_JOURNAL
+
+from pagination import encode_cursor, decode_cursor
+from services.orders.constants import ORDERS_PER_PAGE
+from services.orders.schemas import OrderSchema, OrderSummarySchema, OrderPageSchema
 from contextlib import asynccontextmanager
-from config import MONGO_CONNECT
 
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from .codecs import ORDERS_CODEC_OPTIONS
+from .connect import get_mongo_client
+
+from services.orders.utils import OrderStatus, statuses_allowed_before
 
-from services.orders.utils import OrderStatus
+# Orders are acknowledged to users only after this write concern is satisfied
+ORDERS_WRITE_CONCERN = WriteConcern(
+    w=int(ORDER_WRITE_CONCERN) if ORDER_WRITE_CONCERN.isdigit() else ORDER_WRITE_CONCERN, j=ORDER_WRITE_JOURNAL)
+# Order lists carry summaries, line items only when details are asked for
+SUMMARY_PROJECTION = {'_id': False, 'items': False}
+DETAILS_PROJECTION = {'_id': False}
 
 
 class MongoCRUD:
     """ CRUD - Functions to create, read and interaction with orders """
+    indexes = [
+        IndexModel([('id', ASCENDING)], unique=True),
+        IndexModel([('status', ASCENDING), ('created', ASCENDING), ('id', ASCENDING)]),
+        IndexModel([('username', ASCENDING), ('created', DESCENDING)]),
+        IndexModel([('created', ASCENDING), ('id', ASCENDING)]),
+    ]
 
     @staticmethod
     @asynccontextmanager
     async def get_mongo_collection() -> AsyncIterator[AsyncIOMotorCollection]:
-        client = AsyncIOMotorClient(MONGO_CONNECT)
-        collection: AsyncIOMotorCollection = client.Orders.orders
-        try:
-            yield collection
-        finally:
-            client.close()
+        collection: AsyncIOMotorCollection = get_mongo_client().Orders.get_collection(
+            'orders', codec_options=ORDERS_CODEC_OPTIONS, write_concern=ORDERS_WRITE_CONCERN)
+        yield collection
+
+    @classmethod
+    async def create_indexes(cls) -> None:
+        """ Idempotent, called at startup so every order query is served by an index """
+        async with cls.get_mongo_collection() as collection:
+            await collection.create_indexes(cls.indexes)
+
+    @classmethod
+    async def create(cls, order_document: dict) -> dict:
+        async with cls.get_mongo_collection() as collection:
+            await collection.insert_one(order_document)
+            return order_document
 
     @classmethod
-    async def create(cls, order_schema: str) -> str:
+    async def create_many(cls, order_documents: list[dict]) -> None:
+        """ Unordered, a document which can't be written doesn't stop the rest of the batch """
         async with cls.get_mongo_collection() as collection:
-            parsed_data = json.loads(order_schema)
-            await collection.insert_one(parsed_data)
-            return parsed_data
+            await collection.insert_many(order_documents, ordered=False)
+
+    @staticmethod
+    def _read_order(order: dict, details: bool) -> OrderSchema | OrderSummarySchema:
+        return OrderSchema(**order) if details else OrderSummarySchema(**order)
 
     @classmethod
-    async def get_user_orders(cls, username: str, status: OrderStatus | None = None) -> list[OrderSchema]:
+    async def get_user_orders(cls, username: str, status: OrderStatus | None = None,
+                              details: bool = False) -> list[OrderSchema | OrderSummarySchema]:
         async with cls.get_mongo_collection() as collection:
             query = {'username': username}
             if status:
                 query['status'] = status.value
-            cursor = collection.find(query)
+            projection = DETAILS_PROJECTION if details else SUMMARY_PROJECTION
+            cursor = collection.find(query, projection).sort('created', DESCENDING)
             orders = await cursor.to_list(length=None)
-            return [OrderSchema(**order) for order in orders]
+            return [cls._read_order(order, details) for order in orders]
 
     @classmethod
-    async def get_orders_for_processing(cls, page: int = 1, status: OrderStatus | None = None) -> list[OrderSchema]:
+    async def get_orders_for_processing(cls, cursor: str | None = None, status: OrderStatus | None = None,
+                                        per_page: int = ORDERS_PER_PAGE, details: bool = False) -> OrderPageSchema:
         async with cls.get_mongo_collection() as collection:
-            cursor = collection.find({'status': status.value})
-            orders = await cursor.to_list(length=None)
-            start = (page - 1) * 10
-            end = page * 10
-            return orders[start:end]
+            query = {'status': status.value}
+            if cursor:
+                created, order_id = decode_cursor(cursor)
+                query['$or'] = [{'created': {'$gt': created}}, {'created': created, 'id': {'$gt': order_id}}]
+            projection = DETAILS_PROJECTION if details else SUMMARY_PROJECTION
+            orders_cursor = collection.find(query, projection).sort(
+                [('created', ASCENDING), ('id', ASCENDING)]).limit(per_page + 1)
+            orders = [cls._read_order(order, details) for order in await orders_cursor.to_list(length=per_page + 1)]
+            next_cursor = encode_cursor(orders[per_page - 1].created, orders[per_page - 1].id) \
+                if len(orders) > per_page else None
+            return OrderPageSchema(items=orders[:per_page], next_cursor=next_cursor)
+
+    @classmethod
+    async def iter_orders(cls, batch_size: int, status: OrderStatus | None = None,
+                          created_from: datetime.datetime | None = None, created_to: datetime.datetime | None = None,
+                          details: bool = False) -> AsyncIterator[list[dict]]:
+        """ Raw order documents by cursor batches in creation order, only one batch is held in memory """
+        query = {}
+        if status:
+            query['status'] = status.value
+        if created_from or created_to:
+            query['created'] = {}
+            if created_from:
+                query['created']['$gte'] = created_from
+            if created_to:
+                query['created']['$lt'] = created_to
+        async with cls.get_mongo_collection() as collection:
+            projection = DETAILS_PROJECTION if details else SUMMARY_PROJECTION
+            cursor = collection.find(query, projection, batch_size=batch_size).sort(
+                [('created', ASCENDING), ('id', ASCENDING)])
+            batch = []
+            try:
+                async for order in cursor:
+                    batch.append(order)
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+                if batch:
+                    yield batch
+            finally:
+                await cursor.close()  # Server cursor is not left open when the client goes away
 
     @classmethod
     async def update_order(cls, order_id: uuid.UUID, new_status: OrderStatus) -> OrderSchema:
+        """ Status is checked and changed by one atomic find_one_and_update, the order is read again only on failure """
+        allowed_before = [status.value for status in statuses_allowed_before(new_status)]
         async with cls.get_mongo_collection() as collection:
-            await collection.update_one({'id': str(order_id)}, {'$set': {'status': new_status.value}})
-            updated_order = await collection.find_one({'id': str(order_id)})
+            updated_order = await collection.find_one_and_update(
+                {'id': order_id, 'status': {'$in': allowed_before}},
+                {'$set': {'status': new_status.value}},
+                projection=DETAILS_PROJECTION, return_document=ReturnDocument.AFTER)
             if updated_order is None:
-                raise HTTPException(status_code=404, detail="Order not found")
-            return OrderSchema(**updated_order)
\ No newline at end of file
+                order = await collection.find_one({'id': order_id}, {'status': True})
+                if order is None:
+                    raise HTTPException(status_code=404, detail="Order not found")
+                raise HTTPException(status_code=http_status.HTTP_406_NOT_ACCEPTABLE,
+                                    detail=f"Order can't go from '{order['status']}' to '{new_status.value}'")
+            return OrderSchema(**updated_order)
+
+    @classmethod
+    async def update_orders_status(cls, new_status: OrderStatus, order_ids: list[uuid.UUID] | None = None,
+                                   status: OrderStatus | None = None) -> dict:
+        """ One update_many over the chosen orders, those whose status can't move to the new one are skipped """
+        allowed_before = [allowed.value for allowed in statuses_allowed_before(new_status)
+                          if status is None or allowed == status]
+        query = {'status': {'$in': allowed_before}}
+        if order_ids is not None:
+            query['id'] = {'$in': order_ids}
+        async with cls.get_mongo_collection() as collection:
+            result = await collection.update_many(
+                query, {'$set': {'status': new_status.value}})
+        return {'matched': result.matched_count, 'modified': result.modified_count}
@@ -0,0 +1,75 @@
+"""
+Rewrites orders stored with the whole basket as JSON text into the compact form:
+binary UUIDs, native dates, Decimal128 prices and line items with product id, title, unit price and quantity.
+
+Idempotent, only orders which still have the basket are touched. Run from src directory:
+    python -m mongo.migrate_orders --batch-size 500
+"""
+import argparse
+import asyncio
+import datetime
+import uuid
+from decimal import Decimal
+
+from pymongo import ReplaceOne
+
+from mongo.connect import close_mongo, connect_mongo
+from mongo.crud import MongoCRUD
+from services.orders.schemas import OrderItemSchema, OrderSchema
+from services.orders.utils import make_order_document
+
+CENT = Decimal('0.01')
+
+
+def to_money(value) -> Decimal:
+    return Decimal(str(value)).quantize(CENT)
+
+
+def compact_order(document: dict) -> dict:
+    """ Order of the old format as the document stored now """
+    items = []
+    for line in document['basket']['items']:
+        product = line['item']
+        # Orders placed before unit price was kept have only the product prices
+        unit_price = line.get('unit_price')
+        if unit_price is None:
+            unit_price = product.get('price_with_discount') or product['price']
+        items.append(OrderItemSchema(product_id=uuid.UUID(str(product['id'])), title=product['title'],
+                                     unit_price=to_money(unit_price), quantity=line['quantity'],
+                                     total=to_money(line['full_summa'])))
+    created = document['created']
+    if isinstance(created, str):
+        created = datetime.datetime.fromisoformat(created)
+    order = OrderSchema(id=uuid.UUID(str(document['id'])), username=document['username'], created=created,
+                        post_index=document['post_index'], status=document['status'],
+                        total=to_money(document['basket']['full_summa']), items=items)
+    return make_order_document(order)
+
+
+async def migrate(batch_size: int) -> int:
+    migrated = 0
+    async with MongoCRUD.get_mongo_collection() as collection:
+        cursor = collection.find({'basket': {'$exists': True}}, batch_size=batch_size)
+        requests = []
+        async for document in cursor:
+            requests.append(ReplaceOne({'_id': document['_id']}, compact_order(document)))
+            if len(requests) >= batch_size:
+                migrated += (await collection.bulk_write(requests, ordered=False)).modified_count
+                requests = []
+        if requests:
+            migrated += (await collection.bulk_write(requests, ordered=False)).modified_count
+    return migrated
+
+
+async def main(batch_size: int) -> None:
+    connect_mongo()
+    try:
+        print(f'Migrated orders: {await migrate(batch_size)}')
+    finally:
+        close_mongo()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=500, help='Orders replaced by one bulk write')
+    asyncio.run(main(parser.parse_args().batch_size))
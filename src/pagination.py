@@ -0,0 +1,34 @@
+import base64
+import datetime
+import json
+import uuid
+
+from fastapi import HTTPException
+from starlette import status
+
+
+def encode_sort_cursor(sort_value: str, record_id: uuid.UUID | str) -> str:
+    """ Opaque cursor which points to the last record of a page ordered by (sort column, id) """
+    payload = json.dumps([sort_value, str(record_id)])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_sort_cursor(cursor: str) -> tuple[str, uuid.UUID]:
+    try:
+        sort_value, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(sort_value), uuid.UUID(record_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid cursor')
+
+
+def encode_cursor(created_at: datetime.datetime, record_id: uuid.UUID | str) -> str:
+    """ Opaque cursor which points to the last record of the page """
+    return encode_sort_cursor(created_at.isoformat(), record_id)
+
+
+def decode_cursor(cursor: str) -> tuple[datetime.datetime, uuid.UUID]:
+    created_at, record_id = decode_sort_cursor(cursor)
+    try:
+        return datetime.datetime.fromisoformat(created_at), record_id
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid cursor')
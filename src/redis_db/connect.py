@@ -0,0 +1,7 @@
+from redis import asyncio as aioredis
+
+from config import REDIS_HOST, REDIS_PORT
+
+REDIS_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}'
+
+redis_client = aioredis.from_url(REDIS_URL)
@@ -0,0 +1,415 @@
+import asyncio
+import datetime
+import logging
+import time
+import uuid
+
+import orjson
+from fastapi import HTTPException
+from redis.exceptions import RedisError
+from starlette import status
+
+from services.auth.constants import ACCESS_TOKEN_EXPIRE_MINUTES, USER_STATE_MARK_ATTEMPTS
+from services.basket.constants import BASKET_CACHE_EXPIRE_SECONDS
+from services.email.constants import VERIFY_CODE_EXPIRE_DAYS, VERIFY_CODE_MAX_ATTEMPTS, VERIFY_CODE_RESEND_SECONDS
+from services.email.schemas import CreateVerificationCode
+from services.store.constants import PRODUCT_CACHE_EXPIRE_SECONDS
+from services.store.schemas import ProductReadSchema, ProductCreateSchema
+from .connect import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class ProductCache:
+    """ Read-through cache of single products and listing pages.
+    Products are dropped by writes, pages are kept under the catalog version and left behind when it is bumped """
+    # KEYS: catalog version; ARGV: per page, cursor. Returns version, page and whether the cursor was issued by a
+    # page cached under this version, other cursors are served from postgres and never cached
+    READ_PAGE_SCRIPT = redis_client.register_script("""
+        local version = redis.call('GET', KEYS[1])
+        if not version then
+            return {false, false, 0}
+        end
+        local prefix = 'products:page:' .. version .. ':' .. ARGV[1] .. ':'
+        local known = 1
+        if ARGV[2] ~= '' then
+            known = redis.call('SISMEMBER', prefix .. 'boundaries', ARGV[2])
+        end
+        return {version, redis.call('GET', prefix .. ARGV[2]), known}
+    """)
+    hits = 0
+    misses = 0
+
+    @staticmethod
+    def product_key(product_id: uuid.UUID) -> str:
+        return f'product:{product_id}'
+
+    @staticmethod
+    def page_key(version: int, cursor: str | None, per_page: int) -> str:
+        return f'products:page:{version}:{per_page}:{cursor or ""}'
+
+    @staticmethod
+    def boundaries_key(version: int, per_page: int) -> str:
+        return f'products:page:{version}:{per_page}:boundaries'
+
+    @classmethod
+    def _register(cls, payload: bytes | None) -> bytes | None:
+        if payload is None:
+            cls.misses += 1
+        else:
+            cls.hits += 1
+        return payload
+
+    @classmethod
+    async def read(cls, product_id: uuid.UUID) -> ProductReadSchema | None:
+        try:
+            payload = cls._register(await redis_client.get(cls.product_key(product_id)))
+        except RedisError:
+            return None
+        return ProductReadSchema.model_validate_json(payload) if payload else None
+
+    @classmethod
+    async def create(cls, product: ProductReadSchema) -> None:
+        try:
+            await redis_client.set(cls.product_key(product.id), product.json(), ex=PRODUCT_CACHE_EXPIRE_SECONDS)
+        except RedisError:
+            pass
+
+    @classmethod
+    async def read_many(cls, product_ids: list[uuid.UUID]) -> dict[uuid.UUID, dict]:
+        """ Cached products in ProductReadSchema shape by one MGET, misses are left out """
+        try:
+            payloads = await redis_client.mget([cls.product_key(product_id) for product_id in product_ids])
+        except RedisError:
+            return {}
+        return {product_id: orjson.loads(payload) for product_id, payload in zip(product_ids, payloads)
+                if cls._register(payload) is not None}
+
+    @classmethod
+    async def create_many(cls, products: list[dict]) -> None:
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for product in products:
+                    pipe.set(cls.product_key(product['id']), orjson.dumps(product), ex=PRODUCT_CACHE_EXPIRE_SECONDS)
+                await pipe.execute()
+        except RedisError:
+            pass
+
+    @classmethod
+    async def read_page(cls, cursor: str | None, per_page: int) -> tuple[int | None, dict | None]:
+        """ Catalog version the page belongs to and the page in ProductPageSchema shape.
+        Version is None when a page read now must not be cached: unknown cursor or no catalog version """
+        try:
+            version, payload, known = await cls.READ_PAGE_SCRIPT(keys=[CatalogVersion.KEY],
+                                                                 args=[per_page, cursor or ''])
+        except RedisError:
+            return None, None
+        if not version:
+            await CatalogVersion.read()  # Seeds the version, pages are cached from the next read
+            return None, None
+        page = orjson.loads(payload) if cls._register(payload or None) else None
+        return (int(version) if known else None), page
+
+    @classmethod
+    async def create_page(cls, version: int, cursor: str | None, per_page: int, page: dict) -> None:
+        """ Cache the page and accept its next cursor, so only pages reachable from the first one are cached """
+        boundaries_key = cls.boundaries_key(version, per_page)
+        try:
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.set(cls.page_key(version, cursor, per_page), orjson.dumps(page), ex=PRODUCT_CACHE_EXPIRE_SECONDS)
+                if page['next_cursor']:
+                    pipe.sadd(boundaries_key, page['next_cursor'])
+                    pipe.expire(boundaries_key, PRODUCT_CACHE_EXPIRE_SECONDS)
+                await pipe.execute()
+        except RedisError:
+            pass
+
+    @classmethod
+    async def invalidate(cls, product: ProductReadSchema) -> None:
+        await cls.invalidate_many([product])
+
+    @classmethod
+    async def invalidate_many(cls, products: list[ProductReadSchema | ProductCreateSchema]) -> None:
+        """ Drop the products, listing pages go with the catalog version bumped by the same writes """
+        if not products:
+            return
+        try:
+            await redis_client.delete(*(cls.product_key(product.id) for product in products))
+        except RedisError:
+            pass
+
+    @classmethod
+    def statistics(cls) -> dict:
+        requests = cls.hits + cls.misses
+        return {
+            'hits': cls.hits,
+            'misses': cls.misses,
+            'hit_ratio': cls.hits / requests if requests else 0.0,
+        }
+
+
+class UserStateCache:
+    """ Time of the last ban/unban/verification/deletion of users. Flags in access tokens issued before it are stale,
+    marks live as long as an access token, so a missing mark means the token claims can be trusted """
+
+    @staticmethod
+    def user_key(user_id: uuid.UUID | str) -> str:
+        return f'user_state_changed:{user_id}'
+
+    @classmethod
+    async def changed_since(cls, user_id: uuid.UUID | str, issued_at: int | None) -> bool:
+        """ True when token claims can't be trusted, also when it is unknown because Redis is down """
+        if issued_at is None:
+            return True
+        try:
+            changed_at = await redis_client.get(cls.user_key(user_id))
+        except RedisError:
+            return True
+        return changed_at is not None and float(changed_at) >= issued_at
+
+    @classmethod
+    async def mark_changed(cls, user_id: uuid.UUID | str) -> None:
+        """ Runs after the change is committed. Retried, then reported with 503: until the mark is written,
+        access tokens already issued to the user keep working on their old flags """
+        changed_at = time.time()
+        for attempt in range(1, USER_STATE_MARK_ATTEMPTS + 1):
+            try:
+                await redis_client.set(cls.user_key(user_id), changed_at, ex=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+                return
+            except RedisError:
+                logger.warning('Marking user %s changed failed, attempt %s of %s', user_id, attempt,
+                               USER_STATE_MARK_ATTEMPTS, exc_info=True)
+                if attempt < USER_STATE_MARK_ATTEMPTS:
+                    await asyncio.sleep(0.1 * 2 ** attempt)
+        logger.error('User %s is changed, but issued access tokens are not revoked', user_id)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail=f'User is changed, but access tokens already issued keep the old rights '
+                                   f'for up to {ACCESS_TOKEN_EXPIRE_MINUTES} minutes')
+
+
+class CatalogVersion:
+    """ Counter bumped by every product and category write, catalog ETags are derived from it """
+    KEY = 'catalog:version'
+
+    @classmethod
+    async def read(cls) -> int | None:
+        try:
+            version = await redis_client.get(cls.KEY)
+            if version is None:
+                # Start from the clock, so a lost counter never repeats an ETag clients already hold
+                await redis_client.set(cls.KEY, time.time_ns(), nx=True)
+                version = await redis_client.get(cls.KEY)
+        except RedisError:
+            return None
+        return int(version) if version is not None else None
+
+    @classmethod
+    async def bump(cls) -> None:
+        try:
+            if not await redis_client.incr(cls.KEY) > 1:
+                await redis_client.delete(cls.KEY)  # Counter was lost, let the next read restart it from the clock
+        except RedisError:
+            pass
+
+
+class VerifyCodeStore:
+    """ Email verification codes, expire natively and burn after too many wrong attempts """
+    # Returns 1 when code matches, 0 when it does not, -1 when there is no code, -2 when attempts are exhausted
+    CHECK_CODE_SCRIPT = redis_client.register_script("""
+        local code = redis.call('HGET', KEYS[1], 'code')
+        if not code then
+            return -1
+        end
+        if code == ARGV[1] then
+            redis.call('DEL', KEYS[1])
+            return 1
+        end
+        if redis.call('HINCRBY', KEYS[1], 'attempts', 1) >= tonumber(ARGV[2]) then
+            redis.call('DEL', KEYS[1])
+            return -2
+        end
+        return 0
+    """)
+
+    @staticmethod
+    def code_key(user_id: uuid.UUID | str) -> str:
+        return f'verify_code:{user_id}'
+
+    @staticmethod
+    def resend_key(user_id: uuid.UUID | str) -> str:
+        return f'verify_code_resend:{user_id}'
+
+    @classmethod
+    async def create(cls, code_schema: CreateVerificationCode) -> CreateVerificationCode:
+        """ Replace previous code of the user, at most once per VERIFY_CODE_RESEND_SECONDS """
+        if not await redis_client.set(cls.resend_key(code_schema.users_id), 1, nx=True,
+                                      ex=VERIFY_CODE_RESEND_SECONDS):
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                                detail='Code was already sent, please wait before requesting a new one')
+        code_key = cls.code_key(code_schema.users_id)
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.delete(code_key)
+            pipe.hset(code_key, mapping={'code': code_schema.verify_code, 'attempts': 0})
+            pipe.expire(code_key, datetime.timedelta(days=VERIFY_CODE_EXPIRE_DAYS))
+            await pipe.execute()
+        return code_schema
+
+    @classmethod
+    async def discard(cls, user_id: uuid.UUID | str) -> None:
+        """ Drop the code with its resend throttle, used when the code could not be sent """
+        await redis_client.delete(cls.code_key(user_id), cls.resend_key(user_id))
+
+    @classmethod
+    async def check(cls, user_id: uuid.UUID | str, verify_code: int) -> None:
+        """ Consume the code if it matches, otherwise count the attempt """
+        result = await cls.CHECK_CODE_SCRIPT(keys=[cls.code_key(user_id)],
+                                             args=[verify_code, VERIFY_CODE_MAX_ATTEMPTS])
+        if result == -1:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                                detail='Code invalid or expired, please request a new code')
+        if result == -2:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                                detail='Too many attempts, please request a new code')
+        if result == 0:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Incorrect code, try again!')
+
+
+class BasketCache:
+    """ Hot tier of baskets: hash of product id -> quantity per user, dirty users are flushed to postgres later """
+    DIRTY_KEY = 'baskets:dirty'
+    LOADED_FIELD = '__loaded__'  # Marks hash loaded from postgres, so empty baskets are cached too
+    NOT_LOADED = -2
+    NOT_FOUND = -1
+    # KEYS: basket, dirty set; ARGV: product id, quantity delta, user id
+    _LOADED_CHECK = """
+        if redis.call('EXISTS', KEYS[1]) == 0 then
+            return -2
+        end
+    """
+    # Dirty basket does not expire until it is flushed, otherwise the change would be lost
+    _MARK_DIRTY = """
+        redis.call('SADD', KEYS[2], ARGV[3])
+        redis.call('PERSIST', KEYS[1])
+    """
+    ADD_SCRIPT = redis_client.register_script(_LOADED_CHECK + """
+        local quantity = redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+    """ + _MARK_DIRTY + """
+        return quantity
+    """)
+    UPDATE_SCRIPT = redis_client.register_script(_LOADED_CHECK + """
+        local quantity = redis.call('HGET', KEYS[1], ARGV[1])
+        if not quantity then
+            return -1
+        end
+        quantity = tonumber(quantity) + tonumber(ARGV[2])
+        if quantity < 1 then
+            return 0
+        end
+        redis.call('HSET', KEYS[1], ARGV[1], quantity)
+    """ + _MARK_DIRTY + """
+        return quantity
+    """)
+    DELETE_SCRIPT = redis_client.register_script(_LOADED_CHECK + """
+        local quantity = redis.call('HGET', KEYS[1], ARGV[1])
+        if not quantity then
+            return -1
+        end
+        redis.call('HDEL', KEYS[1], ARGV[1])
+    """ + _MARK_DIRTY + """
+        return tonumber(quantity)
+    """)
+    # ARGV: expire seconds, then product id and quantity pairs
+    LOAD_SCRIPT = redis_client.register_script("""
+        if redis.call('EXISTS', KEYS[1]) == 1 then
+            return 0
+        end
+        redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+        redis.call('EXPIRE', KEYS[1], ARGV[1])
+        return 1
+    """)
+    # KEYS: dirty set, then baskets; ARGV: expire seconds, then user ids. Baskets changed again are still dirty
+    EXPIRE_FLUSHED_SCRIPT = redis_client.register_script("""
+        for index = 2, #KEYS do
+            if redis.call('SISMEMBER', KEYS[1], ARGV[index]) == 0 then
+                redis.call('EXPIRE', KEYS[index], ARGV[1])
+            end
+        end
+    """)
+
+    @staticmethod
+    def basket_key(user_id: uuid.UUID | str) -> str:
+        return f'basket:{user_id}'
+
+    @classmethod
+    async def _run(cls, script, user_id: uuid.UUID, product_id: uuid.UUID, quantity: int = 0) -> int:
+        return await script(keys=[cls.basket_key(user_id), cls.DIRTY_KEY],
+                            args=[str(product_id), quantity, str(user_id)])
+
+    @classmethod
+    async def add(cls, user_id: uuid.UUID, product_id: uuid.UUID, quantity: int) -> int:
+        """ New quantity of the product, NOT_LOADED when the basket has to be loaded first """
+        return await cls._run(cls.ADD_SCRIPT, user_id, product_id, quantity)
+
+    @classmethod
+    async def update(cls, user_id: uuid.UUID, product_id: uuid.UUID, quantity: int) -> int:
+        """ New quantity, 0 when it would drop below one, NOT_FOUND or NOT_LOADED """
+        return await cls._run(cls.UPDATE_SCRIPT, user_id, product_id, quantity)
+
+    @classmethod
+    async def delete(cls, user_id: uuid.UUID, product_id: uuid.UUID) -> int:
+        """ Quantity of the deleted product, NOT_FOUND or NOT_LOADED """
+        return await cls._run(cls.DELETE_SCRIPT, user_id, product_id)
+
+    @classmethod
+    async def load(cls, user_id: uuid.UUID, quantities: dict[uuid.UUID, int]) -> None:
+        """ Fill the basket read from postgres, unless a concurrent request already did """
+        args = [BASKET_CACHE_EXPIRE_SECONDS, cls.LOADED_FIELD, 1]
+        for product_id, quantity in quantities.items():
+            args.extend((str(product_id), quantity))
+        await cls.LOAD_SCRIPT(keys=[cls.basket_key(user_id)], args=args)
+
+    @classmethod
+    async def clear(cls, user_id: uuid.UUID) -> None:
+        basket_key = cls.basket_key(user_id)
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.delete(basket_key)
+            pipe.hset(basket_key, cls.LOADED_FIELD, 1)
+            pipe.sadd(cls.DIRTY_KEY, str(user_id))
+            await pipe.execute()
+
+    @classmethod
+    def _parse(cls, payload: dict[bytes, bytes]) -> dict[uuid.UUID, int]:
+        return {uuid.UUID(product_id.decode()): int(quantity) for product_id, quantity in payload.items()
+                if product_id.decode() != cls.LOADED_FIELD}
+
+    @classmethod
+    async def read(cls, user_id: uuid.UUID) -> dict[uuid.UUID, int] | None:
+        """ Quantities by product, None when the basket is not loaded """
+        payload = await redis_client.hgetall(cls.basket_key(user_id))
+        return cls._parse(payload) if payload else None
+
+    @classmethod
+    async def read_many(cls, user_ids: list[uuid.UUID]) -> dict[uuid.UUID, dict[uuid.UUID, int]]:
+        """ Snapshots of loaded baskets, expired ones are left out """
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.hgetall(cls.basket_key(user_id))
+            payloads = await pipe.execute()
+        return {user_id: cls._parse(payload) for user_id, payload in zip(user_ids, payloads) if payload}
+
+    @classmethod
+    async def pop_dirty(cls, count: int) -> list[uuid.UUID]:
+        user_ids = await redis_client.spop(cls.DIRTY_KEY, count)
+        return [uuid.UUID(user_id.decode()) for user_id in user_ids or []]
+
+    @classmethod
+    async def mark_dirty(cls, user_ids: list[uuid.UUID]) -> None:
+        if user_ids:
+            await redis_client.sadd(cls.DIRTY_KEY, *map(str, user_ids))
+
+    @classmethod
+    async def expire_flushed(cls, user_ids: list[uuid.UUID]) -> None:
+        """ Flushed baskets expire again, unless they were changed after the snapshot """
+        if user_ids:
+            await cls.EXPIRE_FLUSHED_SCRIPT(keys=[cls.DIRTY_KEY, *map(cls.basket_key, user_ids)],
+                                            args=[BASKET_CACHE_EXPIRE_SECONDS, *map(str, user_ids)])
@@ -0,0 +1,22 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def _serialize(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f'Type is not JSON serializable: {type(value).__name__}')
+
+
+class FastJSONResponse(ORJSONResponse):
+    """ Renders trusted pydantic models and rows with orjson, skipping response_model validation and
+    jsonable_encoder. Routes return it directly, response_model stays for the docs """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_serialize, option=orjson.OPT_NON_STR_KEYS)
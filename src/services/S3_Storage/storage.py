@@ -1,9 +1,20 @@
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, AsyncExitStack
+from typing import Protocol
+
+from aiobotocore.config import AioConfig
 from aiobotocore.session import get_session
-from fastapi import UploadFile, HTTPException
+from fastapi import HTTPException
 from starlette import status
 
-from config import S3_ACCESS_KEY, S3_SECRET_KEY, S3_ENDPOINT_URL, S3_BUCKET_NAME
+from config import S3_ACCESS_KEY, S3_SECRET_KEY, S3_ENDPOINT_URL, S3_BUCKET_NAME, S3_ADDRESSING_STYLE, \
+    S3_MAX_POOL_CONNECTIONS, S3_MULTIPART_CHUNK_SIZE
+
+
+class AsyncReadable(Protocol):
+    """ UploadFile or any other source which can be read by chunks """
+
+    async def read(self, size: int = -1) -> bytes:
+        ...
 
 
 class S3Client:
@@ -18,35 +29,80 @@ class S3Client:
             "aws_access_key_id": access_key,
             "aws_secret_access_key": secret_key,
             "endpoint_url": endpoint_url,
+            "config": AioConfig(s3={'addressing_style': S3_ADDRESSING_STYLE},
+                                max_pool_connections=S3_MAX_POOL_CONNECTIONS),
         }
         self.bucket_name = bucket_name
         self.session = get_session()
+        self._exit_stack = AsyncExitStack()
+        self._client = None
+
+    async def start(self) -> None:
+        """ Open the client once, it's kept for the application lifetime """
+        if self._client is None:
+            self._client = await self._exit_stack.enter_async_context(self.session.create_client("s3", **self.config))
+
+    async def close(self) -> None:
+        await self._exit_stack.aclose()
+        self._client = None
 
     @asynccontextmanager
     async def get_client(self):
-        async with self.session.create_client("s3", **self.config) as client:
-            yield client
+        await self.start()
+        yield self._client
+
+    @staticmethod
+    async def _read_part(file: AsyncReadable) -> bytes:
+        part = bytearray()
+        while len(part) < S3_MULTIPART_CHUNK_SIZE:
+            chunk = await file.read(S3_MULTIPART_CHUNK_SIZE - len(part))
+            if not chunk:
+                break
+            part += chunk
+        return bytes(part)
+
+    async def _upload_multipart(self, client, file: AsyncReadable, key: str, first_part: bytes) -> None:
+        upload = await client.create_multipart_upload(Bucket=self.bucket_name, Key=key)
+        upload_id = upload['UploadId']
+        parts = []
+        part = first_part
+        try:
+            while part:
+                part_number = len(parts) + 1
+                response = await client.upload_part(Bucket=self.bucket_name, Key=key, PartNumber=part_number,
+                                                    UploadId=upload_id, Body=part)
+                parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+                part = await self._read_part(file)
+            await client.complete_multipart_upload(Bucket=self.bucket_name, Key=key, UploadId=upload_id,
+                                                   MultipartUpload={'Parts': parts})
+        except Exception:
+            await client.abort_multipart_upload(Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+            raise
 
     async def upload_file(
             self,
-            file: UploadFile,
+            file: AsyncReadable,
             file_name: str
     ):
-        content = await file.read()
+        """ Streams file by chunks, only one part is held in memory whatever the file size is """
+        key = f"{file_name}.png"
         try:
             async with self.get_client() as client:
-                await client.put_object(
-                    Bucket=self.bucket_name,
-                    Key=f"{file_name}.png",
-                    Body=content)
-            return f"{self.config['endpoint_url']}/{self.bucket_name}/{file_name}.png"
+                first_part = await self._read_part(file)
+                if len(first_part) < S3_MULTIPART_CHUNK_SIZE:
+                    await client.put_object(Bucket=self.bucket_name, Key=key, Body=first_part)
+                else:
+                    await self._upload_multipart(client, file, key, first_part)
+            return f"{self.config['endpoint_url']}/{self.bucket_name}/{key}"
         except Exception as expention:
             raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f'{expention}')
 
 
+s3_client = S3Client(access_key=S3_ACCESS_KEY,
+                     secret_key=S3_SECRET_KEY,
+                     endpoint_url=S3_ENDPOINT_URL,
+                     bucket_name=S3_BUCKET_NAME)
+
+
 async def get_s3_storage():
-    s3_client = S3Client(access_key=S3_ACCESS_KEY,
-                         secret_key=S3_SECRET_KEY,
-                         endpoint_url=S3_ENDPOINT_URL,
-                         bucket_name=S3_BUCKET_NAME)
     yield s3_client
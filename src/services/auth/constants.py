@@ -10,5 +10,6 @@ UNBAN_USER_URL = '/unban'
 
 ACCESS_TOKEN_EXPIRE_MINUTES = 10
 REFRESH_TOKEN_EXPIRE_MINUTES = 60 * 24 * 30
+USER_STATE_MARK_ATTEMPTS = 3  # Writes of the revocation mark after ban, unban, verification or deletion
 
 PAGINATOR_ITEMS_PER_PAGE = 10
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends
 from typing import Annotated
-from .schemas import UserReadSchema, TokenScheme
+from .schemas import UserReadSchema, TokenScheme, UserPageSchema
+from responses import FastJSONResponse
 from sql.models import User
 from .constants import DELETE_USER_URL, BAN_USER_URL, UNBAN_USER_URL, GET_CURRENT_USER_BY_TOKEN_URL, \
     GET_ALL_USERS_FROM_DB_URL, FOUND_USER_BY_ID_OR_USERNAME_URL, AUTHORIZATION_URL, REGISTRATION_URL, REFRESH_TOKEN_URL
@@ -44,11 +45,13 @@ async def get_user(user_data: Annotated[UserReadSchema, Depends(UserManager.get_
 
 
 @router.get(GET_ALL_USERS_FROM_DB_URL,
-            response_model=list[UserReadSchema],
+            response_model=UserPageSchema,
+            response_class=FastJSONResponse,
             description='Get all users from db by page'
             )
-async def get_all_users_from_database(list_of_users: Annotated[list[User], Depends(UserManager.get_all_users_from_db)]):
-    return list_of_users
+async def get_all_users_from_database(
+        list_of_users: Annotated[dict, Depends(UserManager.get_all_users_from_db)]):
+    return FastJSONResponse(list_of_users)
 
 
 @router.get(GET_CURRENT_USER_BY_TOKEN_URL,
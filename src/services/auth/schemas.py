@@ -18,6 +18,11 @@ class UserReadSchema(BaseModel):
         from_attributes = True
 
 
+class UserPageSchema(BaseModel):
+    items: list[UserReadSchema]
+    next_cursor: str | None = None
+
+
 class UserCreateSchema(BaseModel):
     username: str = Field(min_length=3, max_length=30)
     password: str = Field(min_length=8)
@@ -53,6 +58,16 @@ class UserDatabaseSchema(BaseModel):
     created_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
 
 
+class UserStateSchema(BaseModel):
+    """ Flags which can change during access token lifetime """
+    verified_email: bool
+    active: bool
+    admin: bool
+
+    class Config:
+        from_attributes = True
+
+
 class UserLoginSchema(BaseModel):
     username: str | None = None
     email: EmailStr | None = None
@@ -63,6 +78,10 @@ class AccessTokenScheme(BaseModel):
     id: str
     username: str
     email: str
+    verified_email: bool
+    active: bool
+    admin: bool
+    created_at: str
     type: str = 'ACCESS'
 
 
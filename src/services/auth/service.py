@@ -3,14 +3,18 @@ from typing import Annotated
 from uuid import UUID
 from fastapi import HTTPException, Depends, Form, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
 from .constants import REFRESH_TOKEN_EXPIRE_MINUTES, ACCESS_TOKEN_EXPIRE_MINUTES, PAGINATOR_ITEMS_PER_PAGE
 from .utils import decode_token, create_user_form, login_user_form, \
-    create_access_and_refresh_token
+    create_access_and_refresh_token, make_access_token_scheme
 from .schemas import UserCreateSchema, UserReadSchema, UserDatabaseSchema, UserLoginSchema, AccessTokenScheme, \
-    RefreshTokenScheme, TokenScheme
+    RefreshTokenScheme, TokenScheme, UserStateSchema
+from redis_db.crud import UserStateCache
 from sql.crud import UserCRUD
+from sql.dependencies import get_db_session
 from sql.models import User
 
 bearer = HTTPBearer()
@@ -19,28 +23,32 @@ bearer = HTTPBearer()
 class UserManager:
     @staticmethod
     async def create_new_user(
-            user_create_schema: Annotated[UserCreateSchema, Depends(create_user_form)]) -> UserReadSchema:
-        result: UserDatabaseSchema = await UserCRUD.create(user_create_schema=user_create_schema)
+            user_create_schema: Annotated[UserCreateSchema, Depends(create_user_form)],
+            session: AsyncSession = Depends(get_db_session)) -> UserReadSchema:
+        result: UserDatabaseSchema = await UserCRUD.create(user_create_schema=user_create_schema, session=session)
         user_read_schema = UserReadSchema(**result.dict())
         return user_read_schema
 
     @staticmethod
     async def get_user_by_id_or_username(user_id: Annotated[UUID, Query()] = None,
                                          username: Annotated[str, Query()] = None,
+                                         session: AsyncSession = Depends(get_db_session)
                                          ):
-        result = await UserCRUD.read(user_id=user_id, username=username)
+        result = await UserCRUD.read(user_id=user_id, username=username, session=session)
         if not result:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='User not found')
         return result
 
     @staticmethod
-    async def get_all_users_from_db(page: Annotated[int, Query(..., ge=1)] = 1) -> list[UserReadSchema]:
-        users = await UserCRUD.get_all_users(page=page, per_page=PAGINATOR_ITEMS_PER_PAGE)
+    async def get_all_users_from_db(cursor: Annotated[str | None, Query(description='Cursor of the next page')] = None,
+                                    session: AsyncSession = Depends(get_db_session)) -> dict:
+        users = await UserCRUD.get_all_users(cursor=cursor, per_page=PAGINATOR_ITEMS_PER_PAGE, session=session)
         return users
 
     @staticmethod
     async def get_current_user(
-            access_token: Annotated[HTTPAuthorizationCredentials, Depends(bearer)]) -> UserReadSchema:
+            access_token: Annotated[HTTPAuthorizationCredentials, Depends(bearer)],
+            session: AsyncSession = Depends(get_db_session)) -> UserReadSchema:
         payload: dict = decode_token(access_token.credentials)
         if not payload:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Token has been expired')
@@ -51,10 +59,22 @@ class UserManager:
         if expiration_time is None:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Token does not have an expiration time')
 
-        user_from_db: User = await UserCRUD.read(user_id=payload.get("id"), username=payload.get("username"))
-        if not user_from_db:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='User not found')
-        user_schema = UserReadSchema.from_orm(user_from_db)
+        try:
+            token_data = AccessTokenScheme(**payload)
+        except ValidationError:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Token is outdated, please refresh it')
+
+        # Flags come from the claims, Postgres is asked only when the user was changed after the token was issued
+        user_state = UserStateSchema(**token_data.dict(include={'verified_email', 'active', 'admin'}))
+        if await UserStateCache.changed_since(token_data.id, payload.get('iat')):
+            user_from_db: User = await UserCRUD.read(user_id=UUID(token_data.id), session=session)
+            if not user_from_db:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='User not found')
+            user_state = UserStateSchema.from_orm(user_from_db)
+        if not user_state.active:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='User is banned')
+        user_schema = UserReadSchema(**token_data.dict(include={'id', 'username', 'email', 'created_at'}),
+                                     **user_state.dict())
         return user_schema
 
     @staticmethod
@@ -78,23 +98,25 @@ class UserManager:
     @staticmethod
     async def delete_user(user_id: Annotated[UUID, Query()],
                           current_user: Annotated[
-                              UserReadSchema, Depends(get_current_verified_user)]) -> UserReadSchema:
+                              UserReadSchema, Depends(get_current_verified_user)],
+                          session: AsyncSession = Depends(get_db_session)) -> UserReadSchema:
         if not current_user.admin:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='You are not admin')
-        deleted_user: UserReadSchema = await UserCRUD.delete(user_id)
+        deleted_user: UserReadSchema = await UserCRUD.delete(user_id, session=session)
         if not deleted_user:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='User not found')
         return deleted_user
 
     @staticmethod
     async def verify_user_and_make_token(
-            user_data: Annotated[UserLoginSchema, Depends(login_user_form)]) -> TokenScheme:
+            user_data: Annotated[UserLoginSchema, Depends(login_user_form)],
+            session: AsyncSession = Depends(get_db_session)) -> TokenScheme:
         if not user_data.email and not user_data.username:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Please, enter username or email')
-        user: User | None = await UserCRUD.verify_user(user_data)
+        user: User | None = await UserCRUD.verify_user(user_data, session=session)
         if not user:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='User not found')
-        access_token_data = AccessTokenScheme(username=user.username, email=user.email, id=str(user.id))
+        access_token_data = make_access_token_scheme(UserReadSchema.from_orm(user))
         refresh_token_data = RefreshTokenScheme(id=str(user.id))
         access_token: str = create_access_and_refresh_token(data=access_token_data,
                                                             expires_delta=timedelta(
@@ -106,30 +128,28 @@ class UserManager:
         return tokens_schemas
 
     @staticmethod
-    async def make_new_refresh_token(token: str = Query(...)):
+    async def make_new_refresh_token(token: str = Query(...), session: AsyncSession = Depends(get_db_session)):
         payload = decode_token(token)
         if not payload:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Refresh token has been expired')
         if payload['type'] != 'REFRESH':
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Incorrect token type')
-        user: User = await UserCRUD.read(user_id=payload['id'])
+        user: User = await UserCRUD.read(user_id=payload['id'], session=session)
         user_schema = UserReadSchema.from_orm(user)
-        new_access_token_scheme = AccessTokenScheme(id=str(user_schema.id),
-                                                    username=user_schema.username,
-                                                    email=user_schema.email)
+        new_access_token_scheme = make_access_token_scheme(user_schema)
         access_token = create_access_and_refresh_token(new_access_token_scheme,
                                                        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
         token_scheme = TokenScheme(access_token=access_token)
         return token_scheme
 
     @staticmethod
-    async def banning_user(user_id: UUID = Form(...)):
-        banned_user = await UserCRUD.ban_user(user_id=user_id)
+    async def banning_user(user_id: UUID = Form(...), session: AsyncSession = Depends(get_db_session)):
+        banned_user = await UserCRUD.ban_user(user_id=user_id, session=session)
         banned_user_schema = UserReadSchema.from_orm(banned_user)
         return banned_user_schema
 
     @staticmethod
-    async def unbanning_user(user_id: UUID = Form(...)):
-        unbanned_user = await UserCRUD.unban_user(user_id=user_id)
+    async def unbanning_user(user_id: UUID = Form(...), session: AsyncSession = Depends(get_db_session)):
+        unbanned_user = await UserCRUD.unban_user(user_id=user_id, session=session)
         unbanned_user_schema = UserReadSchema.from_orm(unbanned_user)
         return unbanned_user_schema
@@ -1,4 +1,8 @@
+import asyncio
+import logging
+import multiprocessing
 import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone, timedelta
 from typing import Annotated
 
@@ -13,7 +17,8 @@ from passlib.context import CryptContext
 
 import config
 
-from services.auth.schemas import UserCreateSchema, UserLoginSchema, AccessTokenScheme, RefreshTokenScheme
+from services.auth.schemas import UserCreateSchema, UserLoginSchema, AccessTokenScheme, RefreshTokenScheme, \
+    UserReadSchema
 
 
 ALGORITHM = "HS256"
@@ -43,12 +48,23 @@ def create_access_and_refresh_token(data: AccessTokenScheme | RefreshTokenScheme
                                     expires_delta: timedelta):
     data = data.dict()
     to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + expires_delta
-    to_encode.update({"exp": expire})
+    issued_at = datetime.now(timezone.utc)
+    to_encode.update({"exp": issued_at + expires_delta, "iat": issued_at})
     encoded_jwt = jwt.encode(to_encode, config.JWT_SECRET_TOKEN, algorithm=ALGORITHM)
     return encoded_jwt
 
 
+def make_access_token_scheme(user: UserReadSchema) -> AccessTokenScheme:
+    """ Access token carries user flags, so authorization doesn't need to load user from db """
+    return AccessTokenScheme(id=str(user.id),
+                             username=user.username,
+                             email=user.email,
+                             verified_email=user.verified_email,
+                             active=user.active,
+                             admin=user.admin,
+                             created_at=user.created_at.isoformat())
+
+
 def decode_token(token: str) -> dict | None:
     try:
         decode_token = jwt.decode(token, config.JWT_SECRET_TOKEN, algorithms=[ALGORITHM])
@@ -64,10 +80,59 @@ def login_user_form(username: Annotated[str | None, Form()] = None,
 
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# passlib 1.7.4 reads bcrypt.__about__, which bcrypt >= 4.1 dropped, and logs the trapped error with a traceback.
+# The version is only informational, hashing works the same
+logging.getLogger('passlib.handlers.bcrypt').setLevel(logging.ERROR)
+
+# Hashes with other cost than BCRYPT_ROUNDS are reported by verify_and_update and rehashed on login
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=config.BCRYPT_ROUNDS,
+                           bcrypt__min_rounds=config.BCRYPT_ROUNDS, bcrypt__max_rounds=config.BCRYPT_ROUNDS)
+
+
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
 def verify_password(password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(password, hashed_password)
\ No newline at end of file
+    return pwd_context.verify(password, hashed_password)
+
+
+def verify_and_update_password_hash(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+# Hashing is CPU bound for tens of milliseconds, worker processes keep it off the event loop and cap the cores
+# it takes at PASSWORD_HASH_WORKERS
+_password_hash_executor: ProcessPoolExecutor | None = None
+_password_hash_semaphore = asyncio.Semaphore(config.PASSWORD_HASH_CONCURRENCY)
+
+
+def get_password_hash_executor() -> ProcessPoolExecutor:
+    global _password_hash_executor
+    if _password_hash_executor is None:
+        _password_hash_executor = ProcessPoolExecutor(max_workers=config.PASSWORD_HASH_WORKERS,
+                                                      mp_context=multiprocessing.get_context('spawn'))
+    return _password_hash_executor
+
+
+def shutdown_password_hash_executor() -> None:
+    global _password_hash_executor
+    if _password_hash_executor is not None:
+        # Not waited for, so application shutdown doesn't block the event loop on running hashes
+        _password_hash_executor.shutdown(wait=False, cancel_futures=True)
+        _password_hash_executor = None
+
+
+async def _run_in_password_hash_executor(func, *args):
+    async with _password_hash_semaphore:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_password_hash_executor(), func, *args)
+
+
+async def hash_password(password: str) -> str:
+    return await _run_in_password_hash_executor(get_password_hash, password)
+
+
+async def verify_and_update_password(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """ Returns verification result and new hash when stored one was made with outdated cost """
+    return await _run_in_password_hash_executor(verify_and_update_password_hash, password, hashed_password)
@@ -3,3 +3,5 @@ DELETE_ITEM_FROM_BASKET = '/delete'
 GET_FULL_BASKET = '/get'
 CLEAR_BASKET = '/clear'
 UPDATE_QUANTITY = '/update'
+
+BASKET_CACHE_EXPIRE_SECONDS = 60 * 60 * 24 * 7  # Idle baskets leave redis, flushed copy stays in postgres
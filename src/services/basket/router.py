@@ -4,8 +4,10 @@ from fastapi import APIRouter, Depends
 from starlette import status
 from starlette.responses import Response
 
+from responses import FastJSONResponse
+
 from .constants import GET_FULL_BASKET, DELETE_ITEM_FROM_BASKET, ADD_ITEM_TO_BASKET, CLEAR_BASKET, UPDATE_QUANTITY
-from .schemas import BasketCreateSchema, BasketReadSchema, FullBasketSchema
+from .schemas import BasketReadSchema, FullBasketSchema
 from .service import BasketManager
 
 router = APIRouter(prefix='/basket', tags=['Basket Routers'])
@@ -13,17 +15,18 @@ router = APIRouter(prefix='/basket', tags=['Basket Routers'])
 
 @router.get(GET_FULL_BASKET,
             response_model=FullBasketSchema,
+            response_class=FastJSONResponse,
             description='Get full user basket'
             )
 async def get_full_user_basket(basket: Annotated[FullBasketSchema, Depends(BasketManager.get_full_basket)]):
-    return basket
+    return FastJSONResponse(basket)
 
 
 @router.post(ADD_ITEM_TO_BASKET,
-             response_model=BasketCreateSchema,
+             response_model=BasketReadSchema,
              description='Add product to basket'
              )
-async def add_item_to_basket(item_schema: Annotated[BasketCreateSchema, Depends(BasketManager.add_item_in_basket)]):
+async def add_item_to_basket(item_schema: Annotated[BasketReadSchema, Depends(BasketManager.add_item_in_basket)]):
     return item_schema
 
 
@@ -1,6 +1,8 @@
 import uuid
+from decimal import Decimal
+from typing import Annotated
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PlainSerializer
 
 from services.store.schemas import ProductReadSchema
 
@@ -21,13 +23,24 @@ class BasketReadSchema(BaseModel):
     class Config:
         from_attributes = True
 
+    @classmethod
+    def for_line(cls, users_id: uuid.UUID, products_id: uuid.UUID, quantity: int) -> 'BasketReadSchema':
+        """ Line of a basket kept outside the table, id is derived from user and product to stay stable """
+        return cls(id=uuid.uuid5(users_id, str(products_id)), products_id=products_id, users_id=users_id,
+                   quantity=quantity)
+
+
+# Exact decimal in python, plain number in JSON like the rest of prices
+Money = Annotated[Decimal, PlainSerializer(float, return_type=float, when_used='json')]
+
 
 class ProductInfoFromBasket(BaseModel):
     item: ProductReadSchema
     quantity: int
-    full_summa: float
+    unit_price: Money
+    full_summa: Money
 
 
 class FullBasketSchema(BaseModel):
-    full_summa: float
+    full_summa: Money
     items: list[ProductInfoFromBasket]
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from uuid import UUID
+
+from fastapi import HTTPException
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from config import BASKET_STORAGE, BASKET_FLUSH_INTERVAL_SECONDS, BASKET_FLUSH_BATCH_SIZE
+from redis_db.crud import BasketCache
+from services.basket.schemas import BasketCreateSchema, BasketReadSchema, FullBasketSchema
+from sql.crud import BasketCRUD, ProductCRUD, get_session
+
+logger = logging.getLogger(__name__)
+
+
+class BasketStorage(ABC):
+    """ Where baskets are edited, chosen by BASKET_STORAGE """
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    @abstractmethod
+    async def add(self, user_id: UUID, product_id: UUID, session: AsyncSession | None = None) -> BasketReadSchema:
+        pass
+
+    @abstractmethod
+    async def update(self, user_id: UUID, product_id: UUID, quantity: int,
+                     session: AsyncSession | None = None) -> BasketReadSchema:
+        pass
+
+    @abstractmethod
+    async def delete(self, user_id: UUID, product_id: UUID, session: AsyncSession | None = None) -> BasketReadSchema:
+        pass
+
+    @abstractmethod
+    async def clear(self, user_id: UUID, session: AsyncSession | None = None) -> None:
+        pass
+
+    @abstractmethod
+    async def full_basket(self, user_id: UUID, session: AsyncSession | None = None) -> FullBasketSchema:
+        pass
+
+
+class PostgresBasketStorage(BasketStorage):
+    """ Every edit is a statement on the baskets table """
+
+    async def add(self, user_id: UUID, product_id: UUID, session: AsyncSession | None = None) -> BasketReadSchema:
+        basket_schema = BasketCreateSchema(products_id=product_id, users_id=user_id)
+        return await BasketCRUD.create(basket_schema=basket_schema, session=session)
+
+    async def update(self, user_id: UUID, product_id: UUID, quantity: int,
+                     session: AsyncSession | None = None) -> BasketReadSchema:
+        return await BasketCRUD.update(user_id=user_id, product_id=product_id, quantity=quantity, session=session)
+
+    async def delete(self, user_id: UUID, product_id: UUID, session: AsyncSession | None = None) -> BasketReadSchema:
+        return await BasketCRUD.delete(user_id=user_id, product_id=product_id, session=session)
+
+    async def clear(self, user_id: UUID, session: AsyncSession | None = None) -> None:
+        await BasketCRUD.clear_basket(user_id=user_id, session=session)
+
+    async def full_basket(self, user_id: UUID, session: AsyncSession | None = None) -> FullBasketSchema:
+        return await BasketCRUD.full_basket(user_id=user_id, session=session)
+
+
+class RedisBasketStorage(BasketStorage):
+    """ Edits are atomic operations on a redis hash, a background task writes changed baskets to postgres """
+
+    def __init__(self, flush_interval: float = BASKET_FLUSH_INTERVAL_SECONDS,
+                 flush_batch_size: int = BASKET_FLUSH_BATCH_SIZE):
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        self._flusher: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._flusher = asyncio.create_task(self._flush_forever())
+
+    async def stop(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        try:
+            await self.flush()
+        except (SQLAlchemyError, RedisError, OSError):
+            logger.exception('Basket flush on shutdown failed, changed baskets stay in redis until the next start')
+
+    async def _load(self, user_id: UUID, session: AsyncSession | None = None) -> None:
+        """ Cold miss, read the basket through from postgres """
+        await BasketCache.load(user_id, await BasketCRUD.read_quantities(user_id, session=session))
+
+    async def _run(self, operation, user_id: UUID, product_id: UUID, *args, session: AsyncSession | None = None):
+        result = await operation(user_id, product_id, *args)
+        if result == BasketCache.NOT_LOADED:
+            await self._load(user_id, session=session)
+            result = await operation(user_id, product_id, *args)
+        if result == BasketCache.NOT_FOUND:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Product not found in basket')
+        return result
+
+    async def add(self, user_id: UUID, product_id: UUID, session: AsyncSession | None = None) -> BasketReadSchema:
+        await ProductCRUD.read(product_id, session=session)
+        quantity = await self._run(BasketCache.add, user_id, product_id, 1, session=session)
+        return BasketReadSchema.for_line(user_id, product_id, quantity)
+
+    async def update(self, user_id: UUID, product_id: UUID, quantity: int,
+                     session: AsyncSession | None = None) -> BasketReadSchema:
+        new_quantity = await self._run(BasketCache.update, user_id, product_id, quantity, session=session)
+        if new_quantity == 0:
+            raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail='This is lower quantity')
+        return BasketReadSchema.for_line(user_id, product_id, new_quantity)
+
+    async def delete(self, user_id: UUID, product_id: UUID, session: AsyncSession | None = None) -> BasketReadSchema:
+        quantity = await self._run(BasketCache.delete, user_id, product_id, session=session)
+        return BasketReadSchema.for_line(user_id, product_id, quantity)
+
+    async def clear(self, user_id: UUID, session: AsyncSession | None = None) -> None:
+        await BasketCache.clear(user_id)
+
+    async def full_basket(self, user_id: UUID, session: AsyncSession | None = None) -> FullBasketSchema:
+        quantities = await BasketCache.read(user_id)
+        if quantities is None:
+            await self._load(user_id, session=session)
+            quantities = await BasketCache.read(user_id) or {}
+        return await BasketCRUD.full_basket_from_quantities(quantities, session=session)
+
+    async def flush(self) -> int:
+        """ Write baskets changed since the last flush to postgres, returns number of flushed baskets """
+        flushed = 0
+        while user_ids := await BasketCache.pop_dirty(self.flush_batch_size):
+            try:
+                async with get_session() as session:
+                    await BasketCRUD.lock_users(user_ids, session)
+                    # Snapshot is taken under the locks, a concurrent flush of the same basket commits first
+                    baskets = await BasketCache.read_many(user_ids)
+                    await BasketCRUD.replace_baskets(baskets, session)
+            except (SQLAlchemyError, RedisError, OSError):
+                await BasketCache.mark_dirty(user_ids)
+                raise
+            if len(baskets) < len(user_ids):
+                # Dirty baskets do not expire, so they were evicted or deleted by hand
+                logger.error('Changes of %s baskets were lost before flush: %s', len(user_ids) - len(baskets),
+                             ', '.join(str(user_id) for user_id in user_ids if user_id not in baskets))
+            await BasketCache.expire_flushed(list(baskets))
+            flushed += len(user_ids)
+        return flushed
+
+    async def _flush_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except (SQLAlchemyError, RedisError, OSError):
+                logger.exception('Basket flush failed, retrying in %s seconds', self.flush_interval)
+
+
+def make_basket_storage(storage: str = BASKET_STORAGE) -> BasketStorage:
+    if storage == 'redis':
+        return RedisBasketStorage()
+    return PostgresBasketStorage()
+
+
+basket_storage = make_basket_storage()
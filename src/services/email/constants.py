@@ -3,4 +3,6 @@ SEND_OR_RESEND_CODE_URL = '/send_code'
 
 
 
-VERIFY_CODE_EXPIRE_DAYS = 1
\ No newline at end of file
+VERIFY_CODE_EXPIRE_DAYS = 1
+VERIFY_CODE_MAX_ATTEMPTS = 5  # Wrong codes allowed before the code is burned
+VERIFY_CODE_RESEND_SECONDS = 60  # Minimal interval between two codes for one user
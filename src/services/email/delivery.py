@@ -0,0 +1,193 @@
+import asyncio
+import smtplib
+import time
+from email.mime.multipart import MIMEMultipart
+
+from fastapi import HTTPException
+from starlette import status
+
+import config
+from services.email.utils import make_verification_email
+
+
+class SMTPConnection:
+    """ Authenticated SMTP connection kept open between messages, reconnects after transient failures """
+
+    def __init__(self):
+        self._smtp: smtplib.SMTP | None = None
+
+    def _connect(self) -> smtplib.SMTP:
+        if config.SMTP_USE_SSL:
+            smtp = smtplib.SMTP_SSL(config.SMTP_HOST, config.SMTP_PORT, timeout=config.SMTP_TIMEOUT)
+        else:
+            smtp = smtplib.SMTP(config.SMTP_HOST, config.SMTP_PORT, timeout=config.SMTP_TIMEOUT)
+        if config.EMAIL_PASS:
+            try:
+                smtp.login(config.EMAIL_ADDRESS, config.EMAIL_PASS)
+            except (smtplib.SMTPException, OSError):
+                smtp.close()
+                raise
+        return smtp
+
+    def send(self, message: MIMEMultipart) -> None:
+        if self._smtp is None:
+            self._smtp = self._connect()
+        try:
+            self._smtp.send_message(message)
+        except (smtplib.SMTPException, OSError) as error:
+            # Session survives a refused message, anything transient may have broken it
+            if is_transient(error):
+                self.close()
+            raise
+
+    def close(self) -> None:
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+
+def is_transient(error: Exception) -> bool:
+    """ Lost connections and 4xx replies may pass on retry; refused sender or recipients, failed login and
+    other SMTP errors will not """
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(error, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPAuthenticationError)):
+        return False
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    # SMTPException is an OSError too, only plain socket errors are left to retry
+    return not isinstance(error, smtplib.SMTPException) and isinstance(error, OSError)
+
+
+def send_batch(connection: SMTPConnection, messages: list[MIMEMultipart]) -> list[Exception | None]:
+    """ Runs in a thread: sends over one session and stops at the first transient error,
+    result per attempted message is None when sent or the error """
+    results = []
+    for message in messages:
+        try:
+            connection.send(message)
+            results.append(None)
+        except (smtplib.SMTPException, OSError) as error:
+            results.append(error)
+            if is_transient(error):
+                break
+    return results
+
+
+class EmailDeliveryStatistics:
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def register_sent(self, latency: float) -> None:
+        self.sent += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+
+class EmailDelivery:
+    """ Bounded queue of messages drained by workers, each one owns a persistent SMTP connection """
+
+    def __init__(self, workers: int = config.EMAIL_WORKERS, queue_size: int = config.EMAIL_QUEUE_SIZE):
+        self.workers_count = workers
+        self.queue_size = queue_size
+        self.statistics = EmailDeliveryStatistics()
+        self._queue: asyncio.Queue | None = None
+        self._workers: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers_count)]
+
+    async def stop(self, timeout: float = 10) -> None:
+        """ Gives workers time to drain the queue, then stops them """
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    def send_verification_code(self, code: int, to_email: str) -> None:
+        if self._queue is None:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail='Email delivery is not running')
+        try:
+            self._queue.put_nowait((make_verification_email(code, to_email), time.perf_counter()))
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail='Too many emails in queue, try again later')
+
+    async def _next_batch(self) -> list[tuple[MIMEMultipart, float]]:
+        """ Waits for a message, then takes what is already queued, up to EMAIL_BATCH_SIZE """
+        batch = [await self._queue.get()]
+        while len(batch) < config.EMAIL_BATCH_SIZE and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _deliver(self, connection: SMTPConnection, message: MIMEMultipart, first_attempt: int = 0) -> bool:
+        """ Transient errors are retried with backoff, permanent ones fail the message at once """
+        for attempt in range(first_attempt, config.EMAIL_MAX_RETRIES + 1):
+            if attempt:
+                self.statistics.retries += 1
+                await asyncio.sleep(config.EMAIL_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+            try:
+                await asyncio.to_thread(connection.send, message)
+                return True
+            except (smtplib.SMTPException, OSError) as error:
+                if not is_transient(error):
+                    return False
+        return False
+
+    async def _deliver_batch(self, connection: SMTPConnection, batch: list[tuple[MIMEMultipart, float]]) -> None:
+        """ The batch goes over one session in one thread call, messages left after a transient error are
+        retried one by one """
+        results = await asyncio.to_thread(send_batch, connection, [message for message, _ in batch])
+        for index, (message, enqueued_at) in enumerate(batch):
+            if index < len(results) and results[index] is None:
+                sent = True
+            elif index < len(results) and not is_transient(results[index]):
+                sent = False
+            else:
+                sent = await self._deliver(connection, message, first_attempt=1 if index < len(results) else 0)
+            if sent:
+                self.statistics.register_sent(time.perf_counter() - enqueued_at)
+            else:
+                self.statistics.failed += 1
+
+    async def _worker(self) -> None:
+        connection = SMTPConnection()
+        try:
+            while True:
+                batch = await self._next_batch()
+                try:
+                    await self._deliver_batch(connection, batch)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+        finally:
+            await asyncio.to_thread(connection.close)
+
+    def get_statistics(self) -> dict:
+        sent = self.statistics.sent
+        return {
+            'queued': self._queue.qsize() if self._queue else 0,
+            'sent': sent,
+            'failed': self.statistics.failed,
+            'retries': self.statistics.retries,
+            'average_latency': self.statistics.total_latency / sent if sent else 0.0,
+            'max_latency': self.statistics.max_latency,
+        }
+
+
+email_delivery = EmailDelivery()
@@ -1,26 +1,32 @@
 from fastapi import Form, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
+from redis_db.crud import VerifyCodeStore
 from services.auth.service import UserManager
+from services.email.delivery import email_delivery
 from services.email.schemas import CreateVerificationCode
 from services.auth.schemas import UserReadSchema
-from sql.crud import VerifyCodeCRUD, UserCRUD
+from sql.crud import UserCRUD
+from sql.dependencies import get_db_session
 
 
 async def verify_user(verification_code: int = Form(..., lt=999999, ge=100000),
-                      current_user: UserReadSchema = Depends(UserManager.get_current_user)):
+                      current_user: UserReadSchema = Depends(UserManager.get_current_user),
+                      session: AsyncSession = Depends(get_db_session)):
     if current_user.verified_email:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='You already verified')
-    code_in_db = await VerifyCodeCRUD.read(current_user)
-    if verification_code != code_in_db:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Incorrect code, try again!')
-    db_updated_user = await UserCRUD.verifying_user(current_user.id)
+    await VerifyCodeStore.check(current_user.id, verification_code)
+    db_updated_user = await UserCRUD.verifying_user(current_user.id, session=session)
     updated_user_schema = UserReadSchema.from_orm(db_updated_user)
     return updated_user_schema
 
 
-async def make_new_code(current_user: UserReadSchema) -> int:
-    new_code = CreateVerificationCode(users_id=current_user.id)
-    await VerifyCodeCRUD.delete(user_schema=current_user)
-    await VerifyCodeCRUD.create(new_code)
-    return new_code.verify_code
+async def send_new_code(current_user: UserReadSchema) -> None:
+    """ Code and resend throttle are dropped again when the mail can't be queued, so the user may retry at once """
+    new_code = await VerifyCodeStore.create(CreateVerificationCode(users_id=current_user.id))
+    try:
+        email_delivery.send_verification_code(new_code.verify_code, current_user.email)
+    except HTTPException:
+        await VerifyCodeStore.discard(current_user.id)
+        raise
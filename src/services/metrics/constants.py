@@ -0,0 +1,5 @@
+DATABASE_POOL_URL = '/database_pool'
+PRODUCT_CACHE_URL = '/product_cache'
+MONGO_POOL_URL = '/mongo_pool'
+EMAIL_DELIVERY_URL = '/email_delivery'
+ORDER_WRITES_URL = '/order_writes'
@@ -0,0 +1,57 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends
+
+from .constants import DATABASE_POOL_URL, PRODUCT_CACHE_URL, MONGO_POOL_URL, EMAIL_DELIVERY_URL, ORDER_WRITES_URL
+from .schemas import DatabasePoolStatisticsSchema, CacheStatisticsSchema, MongoPoolStatisticsSchema, \
+    EmailDeliveryStatisticsSchema, OrderWriteStatisticsSchema
+from .service import MetricsManager
+from ..auth.service import UserManager
+
+router = APIRouter(prefix='/metrics', tags=['Metrics services'],
+                   dependencies=[Depends(UserManager.get_current_admin_user)])
+
+
+@router.get(DATABASE_POOL_URL,
+            response_model=DatabasePoolStatisticsSchema,
+            description='Postgres connection pool statistics (Only for admin!)'
+            )
+async def get_database_pool_statistics(
+        statistics: Annotated[DatabasePoolStatisticsSchema, Depends(MetricsManager.get_database_pool_statistics)]):
+    return statistics
+
+
+@router.get(PRODUCT_CACHE_URL,
+            response_model=CacheStatisticsSchema,
+            description='Product cache hit/miss counters of this worker (Only for admin!)'
+            )
+async def get_product_cache_statistics(
+        statistics: Annotated[CacheStatisticsSchema, Depends(MetricsManager.get_product_cache_statistics)]):
+    return statistics
+
+
+@router.get(MONGO_POOL_URL,
+            response_model=MongoPoolStatisticsSchema,
+            description='MongoDB connection pool statistics of this worker (Only for admin!)'
+            )
+async def get_mongo_pool_statistics(
+        statistics: Annotated[MongoPoolStatisticsSchema, Depends(MetricsManager.get_mongo_pool_statistics)]):
+    return statistics
+
+
+@router.get(EMAIL_DELIVERY_URL,
+            response_model=EmailDeliveryStatisticsSchema,
+            description='Email delivery queue statistics of this worker (Only for admin!)'
+            )
+async def get_email_delivery_statistics(
+        statistics: Annotated[EmailDeliveryStatisticsSchema, Depends(MetricsManager.get_email_delivery_statistics)]):
+    return statistics
+
+
+@router.get(ORDER_WRITES_URL,
+            response_model=OrderWriteStatisticsSchema,
+            description='Order write buffer statistics of this worker (Only for admin!)'
+            )
+async def get_order_write_statistics(
+        statistics: Annotated[OrderWriteStatisticsSchema, Depends(MetricsManager.get_order_write_statistics)]):
+    return statistics
@@ -0,0 +1,49 @@
+from pydantic import BaseModel
+
+
+class DatabasePoolStatisticsSchema(BaseModel):
+    pool_size: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    checkouts: int
+    overflow_events: int
+    timeouts: int
+    average_wait_time: float
+    max_wait_time: float
+
+
+class CacheStatisticsSchema(BaseModel):
+    hits: int
+    misses: int
+    hit_ratio: float
+
+
+class MongoPoolStatisticsSchema(BaseModel):
+    max_pool_size: int
+    connections_created: int
+    connections_closed: int
+    checked_out: int
+    checkouts: int
+    checkout_failures: int
+    average_wait_time: float
+    max_wait_time: float
+
+
+class EmailDeliveryStatisticsSchema(BaseModel):
+    queued: int
+    sent: int
+    failed: int
+    retries: int
+    average_latency: float
+    max_latency: float
+
+
+class OrderWriteStatisticsSchema(BaseModel):
+    queued: int
+    written: int
+    failed: int
+    batches: int
+    average_batch_size: float
+    average_latency: float
+    max_latency: float
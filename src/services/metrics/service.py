@@ -0,0 +1,29 @@
+from mongo.connect import get_mongo_pool_statistics
+from redis_db.crud import ProductCache
+from services.email.delivery import email_delivery
+from services.metrics.schemas import DatabasePoolStatisticsSchema, CacheStatisticsSchema, MongoPoolStatisticsSchema, \
+    EmailDeliveryStatisticsSchema, OrderWriteStatisticsSchema
+from services.orders.writer import order_write_buffer
+from sql.connect import get_pool_statistics
+
+
+class MetricsManager:
+    @staticmethod
+    async def get_database_pool_statistics() -> DatabasePoolStatisticsSchema:
+        return DatabasePoolStatisticsSchema(**get_pool_statistics())
+
+    @staticmethod
+    async def get_product_cache_statistics() -> CacheStatisticsSchema:
+        return CacheStatisticsSchema(**ProductCache.statistics())
+
+    @staticmethod
+    async def get_mongo_pool_statistics() -> MongoPoolStatisticsSchema:
+        return MongoPoolStatisticsSchema(**get_mongo_pool_statistics())
+
+    @staticmethod
+    async def get_email_delivery_statistics() -> EmailDeliveryStatisticsSchema:
+        return EmailDeliveryStatisticsSchema(**email_delivery.get_statistics())
+
+    @staticmethod
+    async def get_order_write_statistics() -> OrderWriteStatisticsSchema:
+        return OrderWriteStatisticsSchema(**order_write_buffer.get_statistics())
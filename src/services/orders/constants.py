@@ -2,3 +2,10 @@ CREATE_ORDER = '/create'
 GET_USER_ORDERS = '/get'
 GET_ALL_ORDERS = '/all'
 CHANGE_ORDER_STATUS = '/update'
+CHANGE_ORDERS_STATUS = '/update_many'
+EXPORT_ORDERS = '/export'
+
+
+ORDERS_PER_PAGE = 10
+ORDERS_STATUS_UPDATE_MAX_IDS = 1000
+ORDERS_EXPORT_MAX_BATCH_SIZE = 10000
@@ -0,0 +1,60 @@
+"""
+Order export for accounting, streamed by cursor batches so memory does not grow with the number of orders.
+NDJSON has one order per line, CSV has one row per line item (per order without details).
+"""
+import csv
+import datetime
+import io
+from decimal import Decimal
+from typing import AsyncIterator
+
+import orjson
+
+from mongo.crud import MongoCRUD
+from services.orders.utils import ExportFormat, OrderStatus
+
+ORDER_COLUMNS = ['id', 'created', 'username', 'status', 'post_index', 'total']
+ITEM_COLUMNS = ['product_id', 'title', 'unit_price', 'quantity', 'item_total']
+MEDIA_TYPES = {ExportFormat.ndjson: 'application/x-ndjson', ExportFormat.csv: 'text/csv'}
+
+
+def _encode_decimal(value: Decimal) -> str:
+    """ Amounts stay exact, as decimal strings like in CSV; UUID and datetime are native to orjson """
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'Type is not JSON serializable: {type(value).__name__}')
+
+
+def ndjson_chunk(orders: list[dict]) -> bytes:
+    return b''.join(orjson.dumps(order, default=_encode_decimal) + b'\n' for order in orders)
+
+
+def csv_rows(order: dict, details: bool) -> list[list]:
+    row = [order['id'], order['created'].isoformat(), order['username'], order['status'], order['post_index'],
+           order['total']]
+    if not details:
+        return [row]
+    return [row + [item['product_id'], item['title'], item['unit_price'], item['quantity'], item['total']]
+            for item in order['items']]
+
+
+def csv_chunk(orders: list[dict], details: bool, header: bool = False) -> bytes:
+    text = io.StringIO()
+    writer = csv.writer(text)
+    if header:
+        writer.writerow(ORDER_COLUMNS + ITEM_COLUMNS if details else ORDER_COLUMNS)
+    for order in orders:
+        writer.writerows(csv_rows(order, details))
+    return text.getvalue().encode()
+
+
+async def stream_orders(export_format: ExportFormat, batch_size: int, status: OrderStatus | None = None,
+                        created_from: datetime.datetime | None = None, created_to: datetime.datetime | None = None,
+                        details: bool = False) -> AsyncIterator[bytes]:
+    """ One chunk per cursor batch, rendered straight from the documents without building models """
+    as_csv = export_format == ExportFormat.csv
+    if as_csv:
+        yield csv_chunk([], details, header=True)
+    async for orders in MongoCRUD.iter_orders(batch_size, status=status, created_from=created_from,
+                                              created_to=created_to, details=details):
+        yield csv_chunk(orders, details) if as_csv else ndjson_chunk(orders)
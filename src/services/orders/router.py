@@ -1,9 +1,15 @@
+from typing import Annotated, AsyncIterator
+
 from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
 
-from services.orders.schemas import OrderSchema
+from services.orders.export import MEDIA_TYPES
+from services.orders.schemas import OrderSchema, OrderSummarySchema, OrderPageSchema, OrdersStatusUpdateResultSchema
 from services.orders.service import create_order_for_buying, get_user_order_by_username, get_user_order_by_status, \
-    update_order_status
-from .constants import CREATE_ORDER, CHANGE_ORDER_STATUS, GET_USER_ORDERS, GET_ALL_ORDERS
+    update_order_status, update_orders_status, export_orders
+from .constants import CREATE_ORDER, CHANGE_ORDER_STATUS, GET_USER_ORDERS, GET_ALL_ORDERS, CHANGE_ORDERS_STATUS, \
+    EXPORT_ORDERS
+from services.orders.utils import ExportFormat
 from ..auth.service import UserManager
 
 router = APIRouter(prefix='/order', tags=['Orders routers'])
@@ -18,16 +24,17 @@ async def create_order(order_schema: OrderSchema = Depends(create_order_for_buyi
 
 @router.get(GET_USER_ORDERS,
             description='Get Order by username',
-            response_model=list[OrderSchema])
-async def get_user_orders(orders_schemas: list[OrderSchema] = Depends(get_user_order_by_username)):
+            response_model=list[OrderSchema | OrderSummarySchema])
+async def get_user_orders(
+        orders_schemas: list[OrderSchema | OrderSummarySchema] = Depends(get_user_order_by_username)):
     return orders_schemas
 
 
 @router.get(GET_ALL_ORDERS,
             description='Get orders for processing status',
-            response_model=list[OrderSchema],
+            response_model=OrderPageSchema,
             dependencies=[Depends(UserManager.get_current_admin_user)])
-async def get_orders_for_processing(orders_schemas: list[OrderSchema] = Depends(get_user_order_by_status)):
+async def get_orders_for_processing(orders_schemas: OrderPageSchema = Depends(get_user_order_by_status)):
     return orders_schemas
 
 
@@ -37,3 +44,21 @@ async def get_orders_for_processing(orders_schemas: list[OrderSchema] = Depends(
             dependencies=[Depends(UserManager.get_current_admin_user)])
 async def update_order_status(updated_order: OrderSchema = Depends(update_order_status)):
     return updated_order
+
+
+@router.put(CHANGE_ORDERS_STATUS,
+            description='Move orders chosen by ids and/or status to new status, not allowed moves are skipped',
+            response_model=OrdersStatusUpdateResultSchema,
+            dependencies=[Depends(UserManager.get_current_admin_user)])
+async def update_orders_status(result: OrdersStatusUpdateResultSchema = Depends(update_orders_status)):
+    return result
+
+
+@router.get(EXPORT_ORDERS,
+            response_class=StreamingResponse,
+            description='Export orders filtered by status and creation date, streamed as NDJSON or CSV',
+            dependencies=[Depends(UserManager.get_current_admin_user)])
+async def export_orders(export: Annotated[tuple[AsyncIterator[bytes], ExportFormat], Depends(export_orders)]):
+    chunks, export_format = export
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[export_format],
+                             headers={'Content-Disposition': f'attachment; filename="orders.{export_format.value}"'})
@@ -1,16 +1,62 @@
 import datetime
 import uuid
 
-from pydantic import BaseModel, Field
+from fastapi import HTTPException
+from pydantic import BaseModel, Field, model_validator
+from starlette import status
 
-from services.basket.schemas import FullBasketSchema
+from services.basket.schemas import FullBasketSchema, Money
+from services.orders.constants import ORDERS_STATUS_UPDATE_MAX_IDS
 from services.orders.utils import OrderStatus
 
 
-class OrderSchema(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    basket: FullBasketSchema
+class OrderItemSchema(BaseModel):
+    """ Line of an order with the product title and price as they were when the order was placed """
+    product_id: uuid.UUID
+    title: str
+    unit_price: Money
+    quantity: int
+    total: Money
+
+
+class OrderSummarySchema(BaseModel):
+    id: uuid.UUID = Field(default_factory=uuid.uuid4)
     username: str
     created: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
     post_index: int
     status: OrderStatus = Field(default=OrderStatus.processing)
+    total: Money
+
+
+class OrderSchema(OrderSummarySchema):
+    items: list[OrderItemSchema]
+
+    @classmethod
+    def from_basket(cls, basket: FullBasketSchema, username: str, post_index: int) -> 'OrderSchema':
+        items = [OrderItemSchema(product_id=line.item.id, title=line.item.title, unit_price=line.unit_price,
+                                 quantity=line.quantity, total=line.full_summa) for line in basket.items]
+        return cls(username=username, post_index=post_index, total=basket.full_summa, items=items)
+
+
+class OrderPageSchema(BaseModel):
+    items: list[OrderSchema | OrderSummarySchema]
+    next_cursor: str | None = None
+
+
+class OrdersStatusUpdateSchema(BaseModel):
+    new_status: OrderStatus
+    order_ids: list[uuid.UUID] | None = Field(default=None, max_length=ORDERS_STATUS_UPDATE_MAX_IDS)
+    status: OrderStatus | None = None  # Only orders in this status, with or without order ids
+
+    @model_validator(mode='after')
+    def validate_selection(self):
+        if self.order_ids is None and self.status is None:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                                detail='Choose orders by order_ids or status')
+        return self
+
+
+class OrdersStatusUpdateResultSchema(BaseModel):
+    matched: int
+    modified: int
+    skipped: int  # Chosen orders whose status can't move to the new one, or ids not found
@@ -1,8 +1,12 @@
+import datetime
 import uuid
-from typing import Annotated
+from typing import Annotated, AsyncIterator
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
+import config
+
 from mongo.crud import MongoCRUD
 from services.auth.schemas import UserReadSchema
 from services.auth.service import UserManager
@@ -10,41 +14,45 @@ from fastapi import Form, Depends, HTTPException, Query
 
 from services.basket.schemas import FullBasketSchema
 from services.basket.service import BasketManager
-from services.orders.schemas import OrderSchema
-from services.orders.utils import OrderStatus
-from sql.crud import BasketCRUD
+from services.basket.storage import basket_storage
+from services.orders.constants import ORDERS_EXPORT_MAX_BATCH_SIZE
+from services.orders.export import stream_orders
+from services.orders.schemas import OrderSchema, OrdersStatusUpdateSchema, OrdersStatusUpdateResultSchema
+from services.orders.utils import ExportFormat, OrderStatus, make_order_document
+from services.orders.writer import order_write_buffer
+from sql.dependencies import get_db_session
 
 
 async def create_order_for_buying(full_basket: FullBasketSchema = Depends(BasketManager.get_full_basket),
                                   current_user: UserReadSchema = Depends(UserManager.get_current_verified_user),
-                                  post_index: int = Form(..., description='Post index to delivery')) -> OrderSchema:
+                                  post_index: int = Form(..., description='Post index to delivery'),
+                                  session: AsyncSession = Depends(get_db_session)) -> OrderSchema:
     if not full_basket.items:
         raise HTTPException(status_code=status.HTTP_201_CREATED, detail='Your basket is empty')
-    order_schema = OrderSchema(
-        basket=full_basket,
-        username=current_user.username,
-        post_index=post_index
-    )
-    json_order_schema = order_schema.json()
+    order_schema = OrderSchema.from_basket(full_basket, username=current_user.username, post_index=post_index)
     try:
-        await MongoCRUD.create(json_order_schema)
-    except:
+        await order_write_buffer.write(make_order_document(order_schema))
+    except HTTPException:
+        raise
+    except Exception:
         raise HTTPException(status_code=status.HTTP_201_CREATED,
                             detail='Something not wrong with trying to save record!')
-    await BasketCRUD.clear_basket(current_user.id)
+    await basket_storage.clear(current_user.id, session=session)
     return order_schema
 
 
 async def get_user_order_by_username(current_user: UserReadSchema = Depends(UserManager.get_current_verified_user),
                                      order_status: Annotated[OrderStatus, Query(...,
-                                                                                description='Get orders by status, send empty if necessary get all orders')] = None):
-    result = await MongoCRUD.get_user_orders(current_user.username, order_status)
+                                                                                description='Get orders by status, send empty if necessary get all orders')] = None,
+                                     details: Annotated[bool, Query(description='Include line items')] = False):
+    result = await MongoCRUD.get_user_orders(current_user.username, order_status, details=details)
     return result
 
 
 async def get_user_order_by_status(order_status: OrderStatus = Query(..., description='Orders necessary status'),
-                                   page: Annotated[int, Query(...)] = 1):
-    result = await MongoCRUD.get_orders_for_processing(status=order_status, page=page)
+                                   cursor: Annotated[str | None, Query(description='Cursor of the next page')] = None,
+                                   details: Annotated[bool, Query(description='Include line items')] = False):
+    result = await MongoCRUD.get_orders_for_processing(status=order_status, cursor=cursor, details=details)
     return result
 
 
@@ -52,3 +60,28 @@ async def update_order_status(order_id: uuid.UUID = Query(..., description='Uniq
                               new_status: OrderStatus = Query(...)):
     result = await MongoCRUD.update_order(order_id=order_id, new_status=new_status)
     return result
+
+
+async def update_orders_status(update_schema: OrdersStatusUpdateSchema) -> OrdersStatusUpdateResultSchema:
+    result = await MongoCRUD.update_orders_status(new_status=update_schema.new_status,
+                                                  order_ids=update_schema.order_ids, status=update_schema.status)
+    skipped = len(set(update_schema.order_ids)) - result['matched'] if update_schema.order_ids is not None else 0
+    return OrdersStatusUpdateResultSchema(**result, skipped=skipped)
+
+
+async def export_orders(export_format: Annotated[ExportFormat, Query(description='NDJSON order per line or CSV')]
+                        = ExportFormat.ndjson,
+                        order_status: Annotated[OrderStatus | None, Query(description='All statuses if empty')] = None,
+                        created_from: Annotated[datetime.datetime | None, Query(description='Created at or after')]
+                        = None,
+                        created_to: Annotated[datetime.datetime | None, Query(description='Created before')] = None,
+                        details: Annotated[bool, Query(description='Include line items')] = False,
+                        batch_size: Annotated[int, Query(ge=1, le=ORDERS_EXPORT_MAX_BATCH_SIZE,
+                                                         description='Orders fetched and sent at once')]
+                        = config.ORDER_EXPORT_BATCH_SIZE) -> tuple[AsyncIterator[bytes], ExportFormat]:
+    if created_from and created_to and created_from >= created_to:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail='created_from must be earlier than created_to')
+    chunks = stream_orders(export_format, batch_size, status=order_status, created_from=created_from,
+                           created_to=created_to, details=details)
+    return chunks, export_format
@@ -1,5 +1,12 @@
 import enum
 
+from pydantic import BaseModel
+
+
+class ExportFormat(str, enum.Enum):
+    ndjson = 'ndjson'
+    csv = 'csv'
+
 
 class OrderStatus(enum.Enum):
     processing = "Processing"
@@ -8,3 +15,24 @@ class OrderStatus(enum.Enum):
     delivered = "Delivered"
     received = "Received"
     cancelled = "Cancelled"
+
+
+# Statuses an order may move to from its current one, final statuses have none
+ALLOWED_TRANSITIONS: dict[OrderStatus, set[OrderStatus]] = {
+    OrderStatus.processing: {OrderStatus.processed, OrderStatus.cancelled},
+    OrderStatus.processed: {OrderStatus.Send_you, OrderStatus.cancelled},
+    OrderStatus.Send_you: {OrderStatus.delivered},
+    OrderStatus.delivered: {OrderStatus.received},
+    OrderStatus.received: set(),
+    OrderStatus.cancelled: set(),
+}
+
+
+def statuses_allowed_before(new_status: OrderStatus) -> list[OrderStatus]:
+    """ Current statuses from which an order may move to the new one """
+    return [status for status, next_statuses in ALLOWED_TRANSITIONS.items() if new_status in next_statuses]
+
+
+def make_order_document(order_schema: BaseModel) -> dict:
+    """ Order as the dict stored in mongo, UUID, Decimal and status are encoded by the orders codec """
+    return order_schema.model_dump()
@@ -0,0 +1,155 @@
+import asyncio
+import time
+
+from fastapi import HTTPException
+from pymongo.errors import BulkWriteError
+from starlette import status
+
+import config
+from mongo.crud import MongoCRUD
+
+
+class OrderWriteStatistics:
+    def __init__(self):
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def register_batch(self, written: int, failed: int, latency: float) -> None:
+        self.batches += 1
+        self.written += written
+        self.failed += failed
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+
+class OrderWriteBuffer:
+    """
+    Orders queued in process and written by insert_many once a batch is full or the flush interval passed.
+    A writer is answered only after its batch is acknowledged with the orders write concern.
+    """
+
+    def __init__(self,
+                 writers: int = config.ORDER_WRITERS,
+                 batch_size: int = config.ORDER_BATCH_SIZE,
+                 flush_interval: float = config.ORDER_FLUSH_INTERVAL_SECONDS,
+                 queue_size: int = config.ORDER_QUEUE_SIZE):
+        self.writers_count = writers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.statistics = OrderWriteStatistics()
+        self._queue: asyncio.Queue | None = None
+        self._writers: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._writers = [asyncio.create_task(self._writer()) for _ in range(self.writers_count)]
+
+    async def stop(self, timeout: float = 10) -> None:
+        """ Writes what is already queued, then stops writers. Orders left unconfirmed after the timeout,
+        in flight or still queued, are answered with 503 """
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        for writer in self._writers:
+            writer.cancel()
+        await asyncio.gather(*self._writers, return_exceptions=True)
+        self._writers = []
+        queued = []
+        while not self._queue.empty():
+            queued.append(self._queue.get_nowait())
+            self._queue.task_done()
+        self._reject(queued)
+        self._queue = None
+
+    async def write(self, document: dict) -> None:
+        """ Returns once the document is written, raises the error of its write otherwise """
+        if self._queue is None:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail='Order writes are not running')
+        written = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((document, written))
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail='Too many orders in queue, try again later')
+        await written
+
+    @staticmethod
+    def _reject(batch: list[tuple[dict, asyncio.Future]]) -> None:
+        for _, written in batch:
+            if not written.done():
+                written.set_exception(HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                                    detail='Order writes are stopped, the order is not confirmed'))
+
+    async def _next_batch(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        """ Fills the batch in place, so the writer knows what it holds when it is cancelled """
+        batch.append(await self._queue.get())
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _flush(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        started = time.perf_counter()
+        errors: dict[int, Exception] = {}
+        try:
+            await MongoCRUD.create_many([document for document, _ in batch])
+        except BulkWriteError as error:
+            # Unordered insert: only the documents reported by index were not written
+            for write_error in error.details.get('writeErrors', []):
+                errors[write_error['index']] = BulkWriteError({'writeErrors': [write_error]})
+            if error.details.get('writeConcernErrors'):
+                errors = dict.fromkeys(range(len(batch)), error)
+        except Exception as error:
+            errors = dict.fromkeys(range(len(batch)), error)
+        for index, (_, written) in enumerate(batch):
+            if written.done():  # Writer has gone, e.g. the request was cancelled
+                continue
+            if index in errors:
+                written.set_exception(errors[index])
+            else:
+                written.set_result(None)
+        self.statistics.register_batch(written=len(batch) - len(errors), failed=len(errors),
+                                       latency=time.perf_counter() - started)
+
+    async def _writer(self) -> None:
+        while True:
+            batch = []
+            try:
+                await self._next_batch(batch)
+                await self._flush(batch)
+            except asyncio.CancelledError:
+                self._reject(batch)
+                raise
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def get_statistics(self) -> dict:
+        batches = self.statistics.batches
+        return {
+            'queued': self._queue.qsize() if self._queue else 0,
+            'written': self.statistics.written,
+            'failed': self.statistics.failed,
+            'batches': batches,
+            'average_batch_size': (self.statistics.written + self.statistics.failed) / batches if batches else 0.0,
+            'average_latency': self.statistics.total_latency / batches if batches else 0.0,
+            'max_latency': self.statistics.max_latency,
+        }
+
+
+order_write_buffer = OrderWriteBuffer()
@@ -1,8 +1,10 @@
 from typing import Annotated
 
 from fastapi import APIRouter, Depends
+
+from responses import FastJSONResponse
 from .schemas import CategoryReadSchema, CategoryCreateSchema
-from .service import CategoryLogic
+from .service import CategoryLogic, category_etag
 from .constants import CREATE_CATEGORY_URL, DELETE_CATEGORY_URL, GET_ALL_CATEGORIES_URL, GET_CATEGORY
 from ..auth.service import UserManager
 
@@ -12,14 +14,17 @@ router = APIRouter(prefix='/categories', tags=['Categories services'])
 @router.get(GET_CATEGORY,
             response_model=CategoryReadSchema,
             description='Get category by id')
-async def read_category(category: Annotated[CategoryReadSchema, Depends(CategoryLogic.get_category)]):
+async def read_category(_: Annotated[dict, Depends(category_etag)],
+                        category: Annotated[CategoryReadSchema, Depends(CategoryLogic.get_category)]):
     return category
 
 @router.get(GET_ALL_CATEGORIES_URL,
             response_model=list[CategoryReadSchema],
+            response_class=FastJSONResponse,
             description='Get all categories')
-async def read_categories(categories: Annotated[list[CategoryReadSchema], Depends(CategoryLogic.get_all_categories)]):
-    return categories
+async def read_categories(headers: Annotated[dict, Depends(category_etag)],
+                          categories: Annotated[list[dict], Depends(CategoryLogic.get_all_categories)]):
+    return FastJSONResponse(categories, headers=headers)
 
 
 @router.post(CREATE_CATEGORY_URL,
@@ -8,7 +8,19 @@ CREATE_PRODUCT = '/create'
 GET_PRODUCT = '/read'
 GET_ALL_PRODUCTS = '/all'
 DELETE_PRODUCT = '/delete'
+SEARCH_PRODUCTS = '/search'
+GET_PRODUCTS_BY_CATEGORY = '/by_category'
+IMPORT_PRODUCTS = '/import'
+GET_PRODUCTS_BATCH = '/batch'
 
 
 PAGINATOR_PRODUCTS_PER_PAGE = 10
+PRODUCT_BATCH_MAX_IDS = 100
+SEARCH_QUERY_MIN_LENGTH = 3  # Shorter text has no trigrams, its ILIKE can't use the trigram indexes
 
+PRODUCT_CACHE_EXPIRE_SECONDS = 60 * 60
+
+# Cache-Control max-age of catalog responses, clients revalidate them with If-None-Match afterwards
+PRODUCT_MAX_AGE_SECONDS = 60
+PRODUCT_LIST_MAX_AGE_SECONDS = 10
+CATEGORY_MAX_AGE_SECONDS = 300
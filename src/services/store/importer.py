@@ -0,0 +1,247 @@
+"""
+Bulk import of products from CSV or NDJSON.
+
+Rows are read in batches, validated with ProductCreateSchema, their images are uploaded concurrently
+and every batch is loaded with one COPY. Progress with errors of every row is reported after each batch.
+Columns: title, description, price, discount, category_id, image (URL or path inside the images directory).
+
+Run from src directory:
+    python -m services.store.importer products.csv --images-dir ./images
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import shutil
+import tempfile
+import uuid
+from collections import Counter
+from decimal import Decimal
+from itertools import islice
+from pathlib import Path
+from typing import IO, AsyncIterator, BinaryIO, Iterator
+
+import aiohttp
+import asyncpg
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+import config
+from redis_db.connect import redis_client
+from redis_db.crud import CatalogVersion, ProductCache
+from services.S3_Storage.storage import S3Client, s3_client
+from sql.connect import async_engine
+from sql.crud import PRODUCT_STORED_COLUMNS, CategoryCRUD, get_session
+from sql.dependencies import call_after_commit
+from sql.models import Category, Product
+from .schemas import ImportFormat, ImportProgressSchema, ImportRowErrorSchema, ProductCreateSchema
+
+COPY_COLUMNS = [column.name for column in PRODUCT_STORED_COLUMNS]
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.webp')
+ROW_ERRORS = (ValueError, TypeError, HTTPException, aiohttp.ClientError, asyncio.TimeoutError, OSError)
+
+
+def import_format_from_filename(filename: str | None) -> ImportFormat:
+    if filename and filename.lower().endswith(('.ndjson', '.jsonl')):
+        return ImportFormat.ndjson
+    return ImportFormat.csv
+
+
+def read_rows(file: BinaryIO, import_format: ImportFormat) -> Iterator[tuple[int, dict | None]]:
+    """ Rows with their line numbers one by one, the file is never loaded whole """
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    if import_format == ImportFormat.csv:
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line, parse_float=Decimal)  # Prices are checked as they were written
+        except ValueError:
+            yield line_number, None
+
+
+def image_source_path(image: str) -> str:
+    return image.split('?', 1)[0].split('#', 1)[0]
+
+
+def parse_product_row(row: dict | None) -> ProductCreateSchema:
+    """ Validated product, its image holds the image source until the image is uploaded """
+    if not isinstance(row, dict):
+        raise ValueError('Row is not a JSON object')
+    values = {name: None if value == '' else value for name, value in row.items()}
+    if values.get('price') is None:
+        raise ValueError('price: Field required')
+    image = values.get('image')
+    if not image or not image_source_path(str(image)).lower().endswith(IMAGE_EXTENSIONS):
+        raise ValueError('Invalid photo format')
+    discount = values.get('discount')
+    return ProductCreateSchema(id=uuid.uuid4(),
+                               title=values.get('title'),
+                               description=values.get('description'),
+                               price=values['price'],
+                               image=str(image),
+                               discount=int(discount) if discount is not None else None,
+                               categories_id=values.get('category_id'))
+
+
+def describe_error(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return '; '.join(f"{'.'.join(map(str, detail['loc']))}: {detail['msg']}" for detail in error.errors())
+    if isinstance(error, HTTPException):
+        return str(error.detail)
+    return str(error) or type(error).__name__
+
+
+class LocalImage:
+    """ File on disk readable by chunks without blocking the event loop """
+
+    def __init__(self, file: IO[bytes]):
+        self.file = file
+
+    async def read(self, size: int = -1) -> bytes:
+        return await asyncio.to_thread(self.file.read, size)
+
+
+class ProductImporter:
+    """ Loads products by batches: rows validated, images uploaded concurrently, then one COPY per batch """
+
+    def __init__(self,
+                 s3_storage: S3Client = s3_client,
+                 images_dir: str | None = config.IMPORT_IMAGES_DIR,
+                 batch_size: int = config.IMPORT_BATCH_SIZE,
+                 image_concurrency: int = config.IMPORT_IMAGE_CONCURRENCY):
+        self.s3_storage = s3_storage
+        self.images_dir = Path(images_dir).resolve() if images_dir else None
+        self.batch_size = batch_size
+        self._uploads = asyncio.Semaphore(image_concurrency)
+
+    async def run(self, file: BinaryIO, import_format: ImportFormat) -> AsyncIterator[ImportProgressSchema]:
+        rows = read_rows(file, import_format)
+        category_ids = await self._category_ids()
+        total = ImportProgressSchema()
+        timeout = aiohttp.ClientTimeout(total=config.IMPORT_IMAGE_TIMEOUT_SECONDS)
+        async with aiohttp.ClientSession(timeout=timeout) as http:
+            # Reading and parsing is blocking, it runs in a thread by batches
+            while batch := await asyncio.to_thread(lambda: list(islice(rows, self.batch_size))):
+                errors: list[ImportRowErrorSchema] = []
+                products = await self._prepare(batch, category_ids, http, errors)
+                if products:
+                    try:
+                        await self._load([product for _, product in products])
+                    except (asyncpg.PostgresError, SQLAlchemyError) as error:
+                        errors += [ImportRowErrorSchema(row=line, detail=f'Batch was not loaded: {error}')
+                                   for line, _ in products]
+                        products = []
+                total.rows += len(batch)
+                total.imported += len(products)
+                total.failed += len(errors)
+                yield total.model_copy(update={'errors': sorted(errors, key=lambda error: error.row)})
+        yield total.model_copy(update={'done': True})
+
+    @staticmethod
+    async def _category_ids() -> set[uuid.UUID]:
+        async with get_session() as session:
+            result = await session.execute(select(Category.id))
+            return set(result.scalars().all())
+
+    async def _prepare(self, batch: list[tuple[int, dict | None]], category_ids: set[uuid.UUID],
+                       http: aiohttp.ClientSession,
+                       errors: list[ImportRowErrorSchema]) -> list[tuple[int, ProductCreateSchema]]:
+        async def prepare_row(line: int, row: dict | None) -> tuple[int, ProductCreateSchema] | None:
+            try:
+                product = parse_product_row(row)
+                if product.categories_id not in category_ids:
+                    raise ValueError('Category not found!')
+                async with self._uploads:
+                    product.image = await self._upload_image(http, product)
+                return line, product
+            except ROW_ERRORS as error:
+                errors.append(ImportRowErrorSchema(row=line, detail=describe_error(error)))
+                return None
+
+        prepared = await asyncio.gather(*(prepare_row(line, row) for line, row in batch))
+        return [row for row in prepared if row is not None]
+
+    async def _upload_image(self, http: aiohttp.ClientSession, product: ProductCreateSchema) -> str:
+        source = product.image
+        if source.startswith(('http://', 'https://')):
+            async with http.get(source) as response:
+                response.raise_for_status()
+                return await self.s3_storage.upload_file(response.content, file_name=str(product.id))
+        with open(self._local_image_path(source), 'rb') as image:
+            return await self.s3_storage.upload_file(LocalImage(image), file_name=str(product.id))
+
+    def _local_image_path(self, source: str) -> Path:
+        if self.images_dir is None:
+            raise ValueError('Local image paths are not allowed, use URL')
+        path = (self.images_dir / source).resolve()
+        if not path.is_relative_to(self.images_dir) or not path.is_file():
+            raise ValueError('Image not found')
+        return path
+
+    @staticmethod
+    async def _load(products: list[ProductCreateSchema]) -> None:
+        """ One COPY and category counters in one transaction, caches are dropped after commit """
+        records = []
+        for product in products:
+            values = product.dict()
+            values['price'] = Decimal(str(values['price']))
+            records.append(tuple(values[column] for column in COPY_COLUMNS))
+        async with get_session() as session:
+            # Counters go first: the driver opens the transaction on the first statement sent through SQLAlchemy,
+            # COPY on the raw connection before it would be committed on its own
+            for category_id, count in Counter(product.categories_id for product in products).items():
+                await CategoryCRUD.change_products_count(category_id, count, session=session)
+            connection = await session.connection()
+            raw_connection = await connection.get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(Product.__tablename__, records=records,
+                                                                         columns=COPY_COLUMNS)
+            call_after_commit(session, lambda: ProductCache.invalidate_many(products))
+            call_after_commit(session, CatalogVersion.bump)
+
+
+def spool_upload(file: BinaryIO) -> BinaryIO:
+    """ Copy of uploaded file owned by the import, request closes its files before the response is streamed """
+    spool = tempfile.TemporaryFile()
+    shutil.copyfileobj(file, spool)
+    spool.seek(0)
+    return spool
+
+
+async def stream_import(file: BinaryIO, import_format: ImportFormat) -> AsyncIterator[bytes]:
+    """ NDJSON lines of import progress, the file is closed when the import ends """
+    try:
+        async for progress in ProductImporter().run(file, import_format):
+            yield progress.json().encode() + b'\n'
+    finally:
+        file.close()
+
+
+async def main(path: str, import_format: ImportFormat | None, images_dir: str | None) -> None:
+    importer = ProductImporter(images_dir=images_dir or str(Path(path).resolve().parent))
+    try:
+        with open(path, 'rb') as file:
+            async for progress in importer.run(file, import_format or import_format_from_filename(path)):
+                print(progress.json(), flush=True)
+    finally:
+        await s3_client.close()
+        await async_engine.dispose()
+        await redis_client.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help='CSV or NDJSON file, one product per row')
+    parser.add_argument('--format', type=ImportFormat, choices=list(ImportFormat), default=None,
+                        help='Taken from file extension by default')
+    parser.add_argument('--images-dir', default=None,
+                        help='Base of local image paths, directory of the file by default')
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.path, arguments.format, arguments.images_dir))
@@ -1,10 +1,14 @@
-from typing import Annotated
+from typing import Annotated, AsyncIterator
 
 from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
 
-from .constants import CREATE_PRODUCT, DELETE_PRODUCT, GET_ALL_PRODUCTS, GET_PRODUCT
-from .schemas import ProductReadSchema
-from .service import ProductLogic
+from responses import FastJSONResponse
+
+from .constants import CREATE_PRODUCT, DELETE_PRODUCT, GET_ALL_PRODUCTS, GET_PRODUCT, SEARCH_PRODUCTS, \
+    GET_PRODUCTS_BY_CATEGORY, IMPORT_PRODUCTS, GET_PRODUCTS_BATCH
+from .schemas import ProductReadSchema, ProductPageSchema, ProductBatchSchema
+from .service import ProductLogic, product_etag, product_list_etag
 from ..auth.service import UserManager
 
 router = APIRouter(prefix='/products', tags=['Products services'])
@@ -19,20 +23,63 @@ async def read_items(new_product_schema: Annotated[ProductReadSchema, Depends(Pr
     return new_product_schema
 
 
+@router.post(IMPORT_PRODUCTS,
+             response_class=StreamingResponse,
+             description='Import products from CSV or NDJSON, progress is streamed as NDJSON after every batch',
+             dependencies=[Depends(UserManager.get_current_admin_user)]
+             )
+async def import_products(progress: Annotated[AsyncIterator[bytes], Depends(ProductLogic.import_products)]):
+    return StreamingResponse(progress, media_type='application/x-ndjson')
+
+
 @router.get(GET_PRODUCT,
             response_model=ProductReadSchema,
             description='Get product by id'
             )
-async def get_product(product: Annotated[ProductReadSchema, Depends(ProductLogic.get_product)]):
+async def get_product(_: Annotated[dict, Depends(product_etag)],
+                      product: Annotated[ProductReadSchema, Depends(ProductLogic.get_product)]):
     return product
 
 
+@router.get(GET_PRODUCTS_BATCH,
+            response_model=ProductBatchSchema,
+            response_class=FastJSONResponse,
+            description='Get several products by ids in one request, ids not found are reported as missing'
+            )
+async def get_products_batch(headers: Annotated[dict, Depends(product_etag)],
+                             products: Annotated[dict, Depends(ProductLogic.get_products_batch)]):
+    return FastJSONResponse(products, headers=headers)
+
+
 @router.get(GET_ALL_PRODUCTS,
-            response_model=list[ProductReadSchema],
+            response_model=ProductPageSchema,
+            response_class=FastJSONResponse,
             description='Get Products by page'
             )
-async def get_products(products: Annotated[list[ProductReadSchema], Depends(ProductLogic.get_products)]):
-    return products
+async def get_products(headers: Annotated[dict, Depends(product_list_etag)],
+                       products: Annotated[dict, Depends(ProductLogic.get_products)]):
+    return FastJSONResponse(products, headers=headers)
+
+
+@router.get(GET_PRODUCTS_BY_CATEGORY,
+            response_model=ProductPageSchema,
+            response_class=FastJSONResponse,
+            description='Get products of category by page'
+            )
+async def get_products_by_category(
+        headers: Annotated[dict, Depends(product_list_etag)],
+        products: Annotated[dict, Depends(ProductLogic.get_products_by_category)]):
+    return FastJSONResponse(products, headers=headers)
+
+
+@router.get(SEARCH_PRODUCTS,
+            response_model=ProductPageSchema,
+            response_class=FastJSONResponse,
+            description='Search products by text with filters and sorting'
+            )
+async def search_products(headers: Annotated[dict, Depends(product_list_etag)],
+                          products: Annotated[dict, Depends(ProductLogic.search_products)]):
+    return FastJSONResponse(products, headers=headers)
 
 
 @router.delete(DELETE_PRODUCT,
@@ -1,15 +1,33 @@
 import datetime
+import re
 import uuid
+from decimal import Decimal
+from enum import Enum
 
 from fastapi import HTTPException
 from pydantic import BaseModel, Field, field_validator
 from starlette import status
 
+PRICE_PATTERN = re.compile(r'-?\d+(\.\d{1,2})?')
+
+
+class ProductSort(str, Enum):
+    newest = 'newest'
+    oldest = 'oldest'
+    cheapest = 'cheapest'
+    most_expensive = 'most_expensive'
+
+
+class ImportFormat(str, Enum):
+    csv = 'csv'
+    ndjson = 'ndjson'
+
 
 class CategoryReadSchema(BaseModel):
     id: uuid.UUID
     title: str
     created_at: datetime.datetime
+    products_count: int = 0
 
     class Config:
         from_attributes = True
@@ -33,17 +51,26 @@ class ProductCreateSchema(BaseModel):
 
     @field_validator('price', mode='before')
     @classmethod
-    def validate_price(cls, price: float):
+    def validate_price(cls, price: str | int | float | Decimal):
+        """ Exact check of the value as it was sent, malformed or over-precise prices are rejected, never rounded """
+        if isinstance(price, str) and PRICE_PATTERN.fullmatch(price.strip()):
+            price = Decimal(price.strip())
+        elif isinstance(price, (int, float, Decimal)) and not isinstance(price, bool):
+            price = Decimal(repr(price)) if isinstance(price, float) else Decimal(price)
+            if not price.is_finite() or not -2 <= price.as_tuple().exponent <= 0:
+                price = None
+        else:
+            price = None
+        if price is None:
+            raise HTTPException(status_code=422, detail='Price must be a number with at most two decimal places.')
+
         if price < 0:
             raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail='Price must be a positive value.')
 
         if price > 9999999.99:
             raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail='Price exceeds the maximum allowed value of 9999999.99')
 
-        if round(price, 2) != price:
-            raise HTTPException(status_code=422, detail='Price must have at most two decimal places.')
-
-        return price
+        return float(price)
 
     @field_validator('discount', mode='before')
     @classmethod
@@ -67,3 +94,36 @@ class ProductReadSchema(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class ProductPageSchema(BaseModel):
+    items: list[ProductReadSchema]
+    next_cursor: str | None = None
+
+
+class ProductBatchSchema(BaseModel):
+    items: list[ProductReadSchema]
+    missing_ids: list[uuid.UUID] = []
+
+
+class ProductSearchSchema(BaseModel):
+    query: str | None = None
+    category_id: uuid.UUID | None = None
+    min_price: Decimal | None = None
+    max_price: Decimal | None = None
+    min_effective_price: Decimal | None = None
+    max_effective_price: Decimal | None = None
+    sort: ProductSort = ProductSort.newest
+
+
+class ImportRowErrorSchema(BaseModel):
+    row: int  # Line of the row in the imported file
+    detail: str
+
+
+class ImportProgressSchema(BaseModel):
+    rows: int = 0
+    imported: int = 0
+    failed: int = 0
+    errors: list[ImportRowErrorSchema] = []  # Errors of the last batch only
+    done: bool = False
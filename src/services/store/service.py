@@ -1,31 +1,68 @@
+import asyncio
 import uuid
-from typing import Annotated
+from decimal import Decimal
+from typing import Annotated, AsyncIterator
 from uuid import UUID
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
+from redis_db.crud import CatalogVersion
 from services.auth.service import UserManager
-from .constants import PAGINATOR_PRODUCTS_PER_PAGE
-from .schemas import CategoryReadSchema, CategoryCreateSchema, ProductCreateSchema, ProductReadSchema
+from .constants import PAGINATOR_PRODUCTS_PER_PAGE, PRODUCT_BATCH_MAX_IDS, PRODUCT_MAX_AGE_SECONDS, PRODUCT_LIST_MAX_AGE_SECONDS, \
+    CATEGORY_MAX_AGE_SECONDS, SEARCH_QUERY_MIN_LENGTH
+from .importer import import_format_from_filename, spool_upload, stream_import
+from .schemas import CategoryReadSchema, CategoryCreateSchema, ProductCreateSchema, ProductReadSchema, \
+    ProductSearchSchema, ProductSort, ImportFormat
 from sql.crud import CategoryCRUD, ProductCRUD
+from sql.dependencies import get_db_session
 from sql.models import Category, User
-from fastapi import Form, Depends, HTTPException, UploadFile, File, Query
+from fastapi import Form, Depends, HTTPException, UploadFile, File, Query, Header, Response
 
-from .utils import image_format_validator
+from .utils import image_format_validator, etag_matches
 from ..S3_Storage.storage import S3Client, get_s3_storage
 from ..auth.schemas import UserReadSchema
 
 
+class CatalogETag:
+    """
+    Conditional GET of catalog routes. Must be the first dependency of a route: a matching If-None-Match
+    ends the request with 304 before the session dependency touches Postgres.
+    Returns headers for routes that build the response themselves.
+    """
+
+    def __init__(self, max_age: int):
+        self.cache_control = f'public, max-age={max_age}'
+
+    async def __call__(self, response: Response,
+                       if_none_match: Annotated[str | None, Header()] = None) -> dict[str, str]:
+        headers = {'Cache-Control': self.cache_control}
+        # Version is read before the data, so a write racing with the request can only make the ETag stale
+        version = await CatalogVersion.read()
+        if version is not None:
+            headers['ETag'] = f'"{version}"'
+            if if_none_match and etag_matches(headers['ETag'], if_none_match):
+                raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+        return headers
+
+
+product_etag = CatalogETag(max_age=PRODUCT_MAX_AGE_SECONDS)
+product_list_etag = CatalogETag(max_age=PRODUCT_LIST_MAX_AGE_SECONDS)
+category_etag = CatalogETag(max_age=CATEGORY_MAX_AGE_SECONDS)
+
+
 class CategoryLogic:
 
     @staticmethod
-    async def get_category(category_id: Annotated[UUID, Query(...)]):
-        category = await CategoryCRUD.read(category_id)
+    async def get_category(category_id: Annotated[UUID, Query(...)],
+                           session: AsyncSession = Depends(get_db_session)):
+        category = await CategoryCRUD.read(category_id, session=session)
         return category
 
     @staticmethod
-    async def get_all_categories() -> list[CategoryReadSchema]:
-        categories = await CategoryCRUD.get_all_categories()
+    async def get_all_categories(session: AsyncSession = Depends(get_db_session)) -> list[dict]:
+        categories = await CategoryCRUD.get_all_categories(session=session)
         return categories
 
     @staticmethod
@@ -35,13 +72,15 @@ class CategoryLogic:
 
     @staticmethod
     async def create_new_category(
-            category_form: Annotated[CategoryCreateSchema, Depends(create_category_form)]) -> CategoryCreateSchema:
-        result = await CategoryCRUD.create(category_form)
+            category_form: Annotated[CategoryCreateSchema, Depends(create_category_form)],
+            session: AsyncSession = Depends(get_db_session)) -> CategoryCreateSchema:
+        result = await CategoryCRUD.create(category_form, session=session)
         return result
 
     @staticmethod
-    async def delete_category(category_id: Annotated[UUID, Query(...)]):
-        result = await CategoryCRUD.delete(category_id)
+    async def delete_category(category_id: Annotated[UUID, Query(...)],
+                              session: AsyncSession = Depends(get_db_session)):
+        result = await CategoryCRUD.delete(category_id, session=session)
         return result
 
 
@@ -52,9 +91,10 @@ class ProductLogic:
             image: UploadFile = Depends(image_format_validator),
             title: str = Form(...),
             description: str | None = Form(default=None),
-            price: float = Form(...),
+            price: str = Form(..., description='Up to two decimal places, e.g. 10.50'),
             discount: int | None = Form(default=None),
             category_id: UUID = Form(...),
+            session: AsyncSession = Depends(get_db_session),
     ) -> ProductReadSchema:
 
         product_id = uuid.uuid4()
@@ -62,31 +102,86 @@ class ProductLogic:
         product_create_schema = ProductCreateSchema(id=product_id,
                                                     title=title,
                                                     description=description,
-                                                    price=round(float(price), 2),
+                                                    price=price,
                                                     image=image_url,
                                                     discount=discount,
                                                     categories_id=category_id)
-        new_product: ProductReadSchema = await ProductCRUD.create(product_create_schema)
+        new_product: ProductReadSchema = await ProductCRUD.create(product_create_schema, session=session)
         return new_product
 
 
     @staticmethod
     async def get_product(
-            product_id: Annotated[UUID, Query(...)]
+            product_id: Annotated[UUID, Query(...)],
+            session: AsyncSession = Depends(get_db_session)
     ) -> ProductReadSchema:
-        product = await ProductCRUD.read(product_id)
+        product = await ProductCRUD.read(product_id, session=session)
         return product
 
+    @staticmethod
+    async def get_products_batch(
+            ids: Annotated[list[UUID], Query(min_length=1, max_length=PRODUCT_BATCH_MAX_IDS)],
+            session: AsyncSession = Depends(get_db_session)
+    ) -> dict:
+        products = await ProductCRUD.get_products_by_ids(ids, session=session)
+        return products
+
     @staticmethod
     async def get_products(
-            page: Annotated[int, Query(..., ge=1)] = 1
-    ) -> list[ProductReadSchema]:
-        products = await ProductCRUD.get_all_products(page=page, per_page=PAGINATOR_PRODUCTS_PER_PAGE)
+            cursor: Annotated[str | None, Query(description='Cursor of the next page')] = None,
+            session: AsyncSession = Depends(get_db_session)
+    ) -> dict:
+        products = await ProductCRUD.get_all_products(cursor=cursor, per_page=PAGINATOR_PRODUCTS_PER_PAGE,
+                                                      session=session)
+        return products
+
+    @staticmethod
+    async def get_products_by_category(
+            category_id: Annotated[UUID, Query(...)],
+            cursor: Annotated[str | None, Query(description='Cursor of the next page')] = None,
+            session: AsyncSession = Depends(get_db_session)
+    ) -> dict:
+        products = await ProductCRUD.get_products_by_category(category_id, cursor=cursor,
+                                                              per_page=PAGINATOR_PRODUCTS_PER_PAGE, session=session)
+        return products
+
+    @staticmethod
+    async def search_products(
+            query: Annotated[str | None, Query(min_length=SEARCH_QUERY_MIN_LENGTH, max_length=100,
+                                               description='Words or part of title/description')] = None,
+            category_id: Annotated[UUID | None, Query()] = None,
+            min_price: Annotated[Decimal | None, Query(ge=0)] = None,
+            max_price: Annotated[Decimal | None, Query(ge=0)] = None,
+            min_effective_price: Annotated[Decimal | None, Query(ge=0, description='Price with discount')] = None,
+            max_effective_price: Annotated[Decimal | None, Query(ge=0, description='Price with discount')] = None,
+            sort: Annotated[ProductSort, Query()] = ProductSort.newest,
+            cursor: Annotated[str | None, Query(description='Cursor of the next page')] = None,
+            session: AsyncSession = Depends(get_db_session)
+    ) -> dict:
+        if query is not None and len(query.strip()) < SEARCH_QUERY_MIN_LENGTH:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                                detail=f'Search query needs at least {SEARCH_QUERY_MIN_LENGTH} characters')
+        search_schema = ProductSearchSchema(query=query.strip() if query else None, category_id=category_id,
+                                            min_price=min_price, max_price=max_price,
+                                            min_effective_price=min_effective_price,
+                                            max_effective_price=max_effective_price, sort=sort)
+        products = await ProductCRUD.search(search_schema, cursor=cursor, per_page=PAGINATOR_PRODUCTS_PER_PAGE,
+                                            session=session)
         return products
 
     @staticmethod
     async def delete_product(
-            product_id: Annotated[UUID, Query(...)]
+            product_id: Annotated[UUID, Query(...)],
+            session: AsyncSession = Depends(get_db_session)
     ) -> ProductReadSchema:
-        deleted_product = await ProductCRUD.delete(product_id=product_id)
+        deleted_product = await ProductCRUD.delete(product_id=product_id, session=session)
         return deleted_product
+
+    @staticmethod
+    async def import_products(
+            file: Annotated[UploadFile, File(description='CSV or NDJSON, one product per row')],
+            import_format: Annotated[ImportFormat | None, Form(description='Taken from file extension by default')]
+            = None,
+    ) -> AsyncIterator[bytes]:
+        spool = await asyncio.to_thread(spool_upload, file.file)
+        return stream_import(spool, import_format or import_format_from_filename(file.filename))
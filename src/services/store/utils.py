@@ -1,3 +1,4 @@
+import re
 from typing import Annotated
 
 from fastapi import UploadFile, File, HTTPException
@@ -18,9 +19,32 @@ def make_products_read_schema(product: RowMapping | Row | ProductCreateSchema) -
     return product_schema
 
 
+def construct_products_read_schema(row: Row) -> ProductReadSchema:
+    """ Schema from a row of PRODUCT_READ_COLUMNS, data from database is trusted and not validated again """
+    return ProductReadSchema.model_construct(**row._mapping)
+
+
 def image_format_validator(image: Annotated[UploadFile, File()]):
     file_name = image.filename.lower()
     if file_name.endswith('.png') or file_name.endswith('.jpg') or file_name.endswith('.webp'):
         return image
     else:
         raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail='Invalid photo format')
+
+
+def make_prefix_tsquery(query: str) -> str | None:
+    """ Every word of the query must match the beginning of a word, e.g. 'red sho' -> 'red:* & sho:*' """
+    words = re.findall(r'\w+', query)
+    return ' & '.join(f'{word}:*' for word in words) if words else None
+
+
+def make_like_pattern(query: str) -> str:
+    escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """ If-None-Match uses weak comparison: W/"1" matches "1", '*' matches any current representation """
+    if if_none_match.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
@@ -1,8 +1,93 @@
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
-from config import DB_USER, DB_PORT, DB_PASS, DB_HOST, DB_NAME
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from config import DB_USER, DB_PORT, DB_PASS, DB_HOST, DB_NAME, DB_ECHO, DB_POOL_SIZE, DB_MAX_OVERFLOW, \
+    DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_CONNECT_TIMEOUT, DB_COMMAND_TIMEOUT, \
+    DB_STATEMENT_CACHE_SIZE
 
 DATABASE_URL = f'postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
 
-async_engine = create_async_engine(url=DATABASE_URL, echo=True)
+
+class PoolStatistics:
+    """ Counters collected by InstrumentedAsyncPool on every connection checkout """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.overflow_events = 0
+        self.timeouts = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def register_checkout(self, wait_time: float, overflow: bool) -> None:
+        self.checkouts += 1
+        self.total_wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+        if overflow:
+            self.overflow_events += 1
+
+    def register_timeout(self, wait_time: float) -> None:
+        self.timeouts += 1
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+
+
+pool_statistics = PoolStatistics()
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """ Async queue pool which measures time spent waiting for a free connection """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        overflow_before = self._overflow
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_statistics.register_timeout(time.perf_counter() - started)
+            raise
+        pool_statistics.register_checkout(wait_time=time.perf_counter() - started,
+                                          overflow=self._overflow > max(overflow_before, 0))
+        return connection
+
+
+def create_engine_from_settings(url: str = DATABASE_URL) -> AsyncEngine:
+    """ Build async engine with pool and asyncpg options taken from config """
+    return create_async_engine(
+        url=url,
+        echo=DB_ECHO,
+        poolclass=InstrumentedAsyncPool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args={
+            'timeout': DB_CONNECT_TIMEOUT,
+            'command_timeout': DB_COMMAND_TIMEOUT,
+            'statement_cache_size': DB_STATEMENT_CACHE_SIZE,
+        },
+    )
+
+
+def get_pool_statistics() -> dict:
+    """ Live state of the engine pool merged with collected checkout counters """
+    pool = async_engine.sync_engine.pool
+    return {
+        'pool_size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        'overflow': max(pool.overflow(), 0),
+        'checkouts': pool_statistics.checkouts,
+        'overflow_events': pool_statistics.overflow_events,
+        'timeouts': pool_statistics.timeouts,
+        'average_wait_time': pool_statistics.total_wait_time / pool_statistics.checkouts
+        if pool_statistics.checkouts else 0.0,
+        'max_wait_time': pool_statistics.max_wait_time,
+    }
+
+
+async_engine = create_engine_from_settings()
 
 AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
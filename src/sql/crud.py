@@ -1,41 +1,93 @@
 import datetime
 from abc import ABC, abstractmethod
+from decimal import Decimal
 from contextlib import asynccontextmanager
 from typing import Type, Any, AsyncGenerator, Iterable
 from uuid import UUID
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
+from pagination import encode_cursor, decode_cursor, encode_sort_cursor, decode_sort_cursor
+from redis_db.crud import CatalogVersion, ProductCache, UserStateCache
 from services.auth.schemas import UserCreateSchema, UserDatabaseSchema, UserReadSchema, UserLoginSchema
-from services.auth.utils import get_password_hash, verify_password
-from services.basket.schemas import BasketCreateSchema, BasketReadSchema
-from services.email.schemas import CreateVerificationCode
-from services.store.schemas import CategoryCreateSchema, CategoryReadSchema, ProductCreateSchema, ProductReadSchema
-from services.store.utils import make_products_read_schema
+from services.auth.utils import hash_password, verify_and_update_password
+from services.basket.schemas import BasketCreateSchema, BasketReadSchema, ProductInfoFromBasket, FullBasketSchema
+from services.store.schemas import CategoryCreateSchema, CategoryReadSchema, ProductCreateSchema, ProductReadSchema, \
+    ProductSearchSchema, ProductSort
+from services.store.utils import make_products_read_schema, construct_products_read_schema, make_prefix_tsquery, \
+    make_like_pattern
 from .connect import AsyncSessionLocal
-from .models import Base, User, Product, Category, Basket, VerificationCode
+from .dependencies import call_after_commit, run_after_commit
+from .models import Base, User, Product, Category, Basket
 from pydantic import BaseModel
 import sqlalchemy as _sql
 from fastapi.exceptions import HTTPException
 
 
+# Columns of read schemas for list endpoints, their rows are returned as plain dicts of the schema shape.
+# Prices come as float, the type of ProductReadSchema fields.
+PRODUCT_READ_COLUMNS = (
+    Product.id, Product.title, Product.description, _sql.cast(Product.price, _sql.Float).label('price'),
+    Product.image, Product.discount, Product.created_at, Product.categories_id,
+    _sql.case((Product.discount > 0, _sql.cast(Product.effective_price, _sql.Float))).label('price_with_discount'),
+)
+CATEGORY_READ_COLUMNS = (Category.id, Category.title, Category.created_at, Category.products_count)
+USER_READ_COLUMNS = (User.id, User.username, User.email, User.verified_email, User.active, User.admin,
+                     User.created_at)
+# Columns written by the application, generated ones are computed by postgres
+PRODUCT_STORED_COLUMNS = tuple(column for column in Product.__table__.columns if column.computed is None)
+
+
 async def session_generator() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         yield session
 
 
-# Context manager to get session
+# Context manager to get session, reuses request session when it passed
 @asynccontextmanager
-async def get_session() -> AsyncSession:
+async def get_session(session: AsyncSession | None = None) -> AsyncSession:
+    if session is not None:
+        yield session
+        return
     async for session in session_generator():
         try:
             async with session.begin():
                 yield session
+            await run_after_commit(session)
         finally:
             await session.close()
 
 
+def keyset_paginate(stmt: _sql.Select, db_model: Type[Base], cursor: str | None, per_page: int) -> _sql.Select:
+    """ Order by (created_at, id) and seek past the cursor, one extra row tells whether next page exists """
+    if cursor:
+        created_at, record_id = decode_cursor(cursor)
+        stmt = stmt.where(_sql.tuple_(db_model.created_at, db_model.id) > _sql.tuple_(created_at, record_id))
+    return stmt.order_by(db_model.created_at, db_model.id).limit(per_page + 1)
+
+
+def next_page_cursor(records: list, per_page: int) -> str | None:
+    if len(records) <= per_page:
+        return None
+    last_record = records[per_page - 1]
+    return encode_cursor(last_record.created_at, last_record.id)
+
+
+def violated_constraint(error: IntegrityError) -> str:
+    """ Name of the constraint or unique index broken by the statement, asyncpg error is the cause of the DBAPI one """
+    return getattr(error.orig.__cause__, 'constraint_name', None) or ''
+
+
+def rows_as_dicts(rows: Iterable[_sql.Row], columns: Iterable) -> list[dict]:
+    """ Trusted rows of *_READ_COLUMNS as dicts, far cheaper than validating a schema per row.
+    Extra trailing columns of the rows are left out """
+    keys = [column.name for column in columns]
+    return [dict(zip(keys, row)) for row in rows]
+
+
 ############################################################################
 #              Abstract class to give an example for child class           #
 ############################################################################
@@ -69,8 +121,8 @@ class UserCRUD(BaseCRUD):
 
     @classmethod
     async def read(cls, user_id: UUID | None = None, username: str | None = None,
-                   email: str | None = None) -> User | None:
-        async with get_session() as session:
+                   email: str | None = None, session: AsyncSession | None = None) -> User | None:
+        async with get_session(session) as session:
             if user_id or username or email:
                 stmt = _sql.select(cls.__db_model).where(
                     _sql.or_(cls.__db_model.username == username, cls.__db_model.id == user_id,
@@ -84,47 +136,48 @@ class UserCRUD(BaseCRUD):
             return user
 
     @classmethod
-    async def create(cls, user_create_schema: UserCreateSchema) -> UserDatabaseSchema:
-        async with get_session() as session:
-            existing_user: UserReadSchema | None = await cls.read(username=user_create_schema.username)
-            if existing_user:
-                raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail='Username already exists')
-            existing_user_email: UserReadSchema | None = await cls.read(email=user_create_schema.email)
-            if existing_user_email:
-                raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail='Email already exists')
-            hashed_password = get_password_hash(user_create_schema.password)
-            user_database_schema = UserDatabaseSchema(**user_create_schema.dict(), hashed_password=hashed_password)
-            new_user = cls.__db_model(
-                **user_database_schema.dict(),
-            )
-            session.add(new_user)
-            await session.commit()
+    async def create(cls, user_create_schema: UserCreateSchema,
+                     session: AsyncSession | None = None) -> UserDatabaseSchema:
+        """ Unique constraints of username and email decide, the insert is the only statement """
+        hashed_password = await hash_password(user_create_schema.password)
+        user_database_schema = UserDatabaseSchema(**user_create_schema.dict(), hashed_password=hashed_password)
+        async with get_session(session) as session:
+            try:
+                await session.execute(_sql.insert(cls.__db_model).values(**user_database_schema.dict()))
+            except IntegrityError as error:
+                if 'username' in violated_constraint(error):
+                    raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail='Username already exists')
+                if 'email' in violated_constraint(error):
+                    raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail='Email already exists')
+                raise
             return user_database_schema
 
     @classmethod
-    async def delete(cls, user_id: UUID) -> UserReadSchema | None:
-        async with get_session() as session:
-            stmt = _sql.select(cls.__db_model).where(cls.__db_model.id == user_id)
+    async def delete(cls, user_id: UUID, session: AsyncSession | None = None) -> UserReadSchema | None:
+        async with get_session(session) as session:
+            stmt = _sql.delete(cls.__db_model).where(cls.__db_model.id == user_id).returning(cls.__db_model)
             result = await session.execute(stmt)
             user: User = result.scalars().first()
             if user is None:
                 return user
-            delete_stmt = _sql.delete(cls.__db_model).where(cls.__db_model.id == user_id)
-            await session.execute(delete_stmt)
+            call_after_commit(session, lambda: UserStateCache.mark_changed(user_id))
             return user
 
     @classmethod
-    async def get_all_users(cls, page: int = 1, per_page: int = 10) -> list[UserReadSchema]:
-        async with get_session() as session:
-            stmt = _sql.select(cls.__db_model).offset((page - 1) * per_page).limit(per_page)
+    async def get_all_users(cls, cursor: str | None = None, per_page: int = 10,
+                            session: AsyncSession | None = None) -> dict:
+        """ Page in UserPageSchema shape """
+        async with get_session(session) as session:
+            stmt = keyset_paginate(_sql.select(*USER_READ_COLUMNS), cls.__db_model, cursor, per_page)
             result = await session.execute(stmt)
-            users_models = result.scalars().all()
-            users = [UserReadSchema.from_orm(user) for user in users_models]
-            return users
+            rows = result.all()
+            return {'items': rows_as_dicts(rows[:per_page], USER_READ_COLUMNS),
+                    'next_cursor': next_page_cursor(rows, per_page)}
 
     @classmethod
-    async def verify_user(cls, user_data: UserLoginSchema) -> UserReadSchema | None:
-        async with get_session() as session:
+    async def verify_user(cls, user_data: UserLoginSchema,
+                          session: AsyncSession | None = None) -> UserReadSchema | None:
+        async with get_session(session) as session:
             if user_data.username:
                 stmt = _sql.select(cls.__db_model).where(cls.__db_model.username == user_data.username)
             elif user_data.email:
@@ -135,125 +188,73 @@ class UserCRUD(BaseCRUD):
             user: User = result.scalars().first()
             if not user:
                 return None
-            verify: bool = verify_password(password=user_data.password, hashed_password=user.hashed_password)
+            verify, new_hashed_password = await verify_and_update_password(password=user_data.password,
+                                                                           hashed_password=user.hashed_password)
             if not verify:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Incorrect password')
+            if new_hashed_password:
+                user.hashed_password = new_hashed_password
             return user
 
     @classmethod
-    async def ban_user(cls, user_id: UUID) -> UserReadSchema:
-        async with get_session() as session:
-            stmt = _sql.select(cls.__db_model).where(cls.__db_model.id == user_id)
-            result = await session.execute(stmt)
-            user: User = result.scalars().first()
-            if not user:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='User not found')
-            if not user.active:
-                raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail='User already banned')
-            stmt = _sql.update(cls.__db_model).where(cls.__db_model.id == user_id).values(active=False)
-            await session.execute(stmt)
-            await session.commit()
-        async with get_session() as session:
-            stmt = _sql.select(cls.__db_model).where(cls.__db_model.id == user_id)
-            result = await session.execute(stmt)
-            user: User = result.scalars().first()
-            return user
+    async def _change_active(cls, user_id: UUID, active: bool, session: AsyncSession) -> User:
+        """ One UPDATE joined with the locked row as it was before, so missing and unchanged users are both told """
+        old = _sql.select(cls.__db_model.id, cls.__db_model.active).where(
+            cls.__db_model.id == user_id).with_for_update().subquery('old')
+        stmt = _sql.update(cls.__db_model).where(cls.__db_model.id == old.c.id).values(active=active).returning(
+            cls.__db_model, old.c.active).execution_options(synchronize_session=False, populate_existing=True)
+        result = await session.execute(stmt)
+        row = result.first()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='User not found')
+        user, was_active = row
+        if bool(was_active) == active:
+            detail = 'User already unbanned' if active else 'User already banned'
+            raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=detail)
+        call_after_commit(session, lambda: UserStateCache.mark_changed(user_id))
+        return user
 
     @classmethod
-    async def unban_user(cls, user_id: UUID) -> User:
-        async with get_session() as session:
-            stmt = _sql.select(cls.__db_model).where(cls.__db_model.id == user_id)
-            result = await session.execute(stmt)
-            user: User = result.scalars().first()
-            if not user:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='User not found')
-            if user.active:
-                raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail='User already unbanned')
-            stmt = _sql.update(cls.__db_model).where(cls.__db_model.id == user_id).values(active=True)
-            await session.execute(stmt)
-            await session.commit()
-        async with get_session() as session:
-            stmt = _sql.select(cls.__db_model).where(cls.__db_model.id == user_id)
-            result = await session.execute(stmt)
-            user: User = result.scalars().first()
-            return user
+    async def ban_user(cls, user_id: UUID, session: AsyncSession | None = None) -> User:
+        async with get_session(session) as session:
+            return await cls._change_active(user_id, active=False, session=session)
 
     @classmethod
-    async def verifying_user(cls, user_id: UUID) -> User:
-        async with get_session() as session:
-            stmt = _sql.update(cls.__db_model).where(cls.__db_model.id == user_id).values(verified_email=True)
-            await session.execute(stmt)
-            await session.commit()
+    async def unban_user(cls, user_id: UUID, session: AsyncSession | None = None) -> User:
+        async with get_session(session) as session:
+            return await cls._change_active(user_id, active=True, session=session)
 
-        async with get_session() as session:
-            stmt = _sql.select(cls.__db_model).where(cls.__db_model.id == user_id)
+    @classmethod
+    async def verifying_user(cls, user_id: UUID, session: AsyncSession | None = None) -> User:
+        async with get_session(session) as session:
+            stmt = _sql.update(cls.__db_model).where(cls.__db_model.id == user_id).values(
+                verified_email=True).returning(cls.__db_model).execution_options(populate_existing=True)
             result = await session.execute(stmt)
             user = result.scalars().first()
+            if user is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='User not found')
+            call_after_commit(session, lambda: UserStateCache.mark_changed(user_id))
             return user
 
 
-class VerifyCodeCRUD(BaseCRUD):
-    """ Verification Codes """
-    __db_model = VerificationCode
-
-    @classmethod
-    async def create(cls, code_schema: CreateVerificationCode) -> CreateVerificationCode:
-        async with get_session() as session:
-            stmt = _sql.select(cls.__db_model).where(cls.__db_model.users_id == code_schema.users_id)
-            result = await session.execute(stmt)
-            code_record = result.scalars().first()
-            if not code_record:
-                stmt = _sql.insert(cls.__db_model).values(**code_schema.dict())
-                await session.execute(stmt)
-                return code_schema
-            else:
-                stmt_delete_old = _sql.delete(cls.__db_model).where(cls.__db_model.users_id == code_schema.users_id)
-                await session.execute(stmt_delete_old)
-                await session.commit()
-                await session.close()
-                async with get_session() as session:
-                    stmt = _sql.insert(cls.__db_model).values(**code_schema.dict())
-                    await session.execute(stmt)
-            return code_schema
-
-    @classmethod
-    async def read(cls, user_schema: UserReadSchema) -> int:
-        async with get_session() as session:
-            stmt = _sql.select(cls.__db_model).where(cls.__db_model.users_id == user_schema.id)
-            result = await session.execute(stmt)
-            verify_code: VerificationCode = result.scalars().first()
-            if not verify_code or datetime.datetime.utcnow() > verify_code.expire_to:
-                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                                    detail='Code invalid or expired, please request a new code')
-            return int(verify_code.verify_code)
-
-    @classmethod
-    async def delete(cls, user_schema: UserReadSchema) -> UserReadSchema:
-        async with get_session() as session:
-            stmt = _sql.delete(cls.__db_model).where(cls.__db_model.id == user_schema.id)
-            await session.execute(stmt)
-            await session.commit()
-            return user_schema
-
-
 class CategoryCRUD(BaseCRUD):
     __db_model = Category
 
     @classmethod
-    async def create(cls, category_create_schema: CategoryCreateSchema) -> CategoryCreateSchema:
-        async with get_session() as session:
-            stmt = _sql.select(cls.__db_model).where(cls.__db_model.title == category_create_schema.title)
-            request = await session.execute(statement=stmt)
-            result = request.scalars().first()
-            if result:
+    async def create(cls, category_create_schema: CategoryCreateSchema,
+                     session: AsyncSession | None = None) -> CategoryCreateSchema:
+        async with get_session(session) as session:
+            stmt = pg_insert(cls.__db_model).values(**category_create_schema.dict()).on_conflict_do_nothing(
+                index_elements=[cls.__db_model.title]).returning(cls.__db_model.id)
+            result = await session.execute(statement=stmt)
+            if result.first() is None:
                 raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail='Category already exist')
-            stmt = _sql.insert(cls.__db_model).values(**category_create_schema.dict())
-            await session.execute(statement=stmt)
+            call_after_commit(session, CatalogVersion.bump)
             return category_create_schema
 
     @classmethod
-    async def read(cls, category_id: UUID) -> CategoryReadSchema:
-        async with get_session() as session:
+    async def read(cls, category_id: UUID, session: AsyncSession | None = None) -> CategoryReadSchema:
+        async with get_session(session) as session:
             stmt = _sql.select(cls.__db_model).where(cls.__db_model.id == category_id)
             result = await session.execute(stmt)
             category = result.scalars().first()
@@ -262,145 +263,323 @@ class CategoryCRUD(BaseCRUD):
             return CategoryReadSchema.from_orm(category)
 
     @classmethod
-    async def delete(cls, category_id: UUID) -> CategoryReadSchema | None:
-        async with get_session() as session:
-            stmt = _sql.select(cls.__db_model).where(cls.__db_model.id == category_id)
+    async def delete(cls, category_id: UUID, session: AsyncSession | None = None) -> CategoryReadSchema | None:
+        async with get_session(session) as session:
+            stmt = _sql.delete(cls.__db_model).where(cls.__db_model.id == category_id).returning(cls.__db_model)
             result = await session.execute(stmt)
             category_schema: Category = result.scalars().first()
             if not category_schema:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Category not found!')
-            delete_stmt = _sql.delete(cls.__db_model).where(cls.__db_model.id == category_id)
-            await session.execute(delete_stmt)
+            call_after_commit(session, CatalogVersion.bump)
             return category_schema
 
     @classmethod
-    async def get_all_categories(cls) -> list[CategoryReadSchema]:
-        async with get_session() as session:
-            stmt = _sql.select(cls.__db_model)
+    async def change_products_count(cls, category_id: UUID | None, difference: int,
+                                    session: AsyncSession | None = None) -> None:
+        """ Keep category counter in step with product writes, in their transaction """
+        if category_id is None:
+            return
+        stmt = _sql.update(cls.__db_model).where(cls.__db_model.id == category_id).values(
+            products_count=cls.__db_model.products_count + difference)
+        async with get_session(session) as session:
+            await session.execute(stmt)
+
+    @classmethod
+    async def get_all_categories(cls, session: AsyncSession | None = None) -> list[dict]:
+        """ Categories in CategoryReadSchema shape """
+        async with get_session(session) as session:
+            stmt = _sql.select(*CATEGORY_READ_COLUMNS)
             result = await session.execute(stmt)
-            categories = result.scalars().all()
-            parsed_categories = [CategoryReadSchema.from_orm(category) for category in categories]
-            return parsed_categories
+            return rows_as_dicts(result.all(), CATEGORY_READ_COLUMNS)
 
 
 class ProductCRUD(BaseCRUD):
     __db_model = Product
 
     @classmethod
-    async def create(cls, product_schema: ProductCreateSchema) -> ProductReadSchema:
-        async with get_session() as session:
+    async def create(cls, product_schema: ProductCreateSchema,
+                     session: AsyncSession | None = None) -> ProductReadSchema:
+        """ Primary key and unique image decide, the insert with the category counter is the only statement """
+        async with get_session(session) as session:
+            # Insert and category counter in one statement, the counter update reads the inserted row
+            inserted = _sql.insert(Product).values(**product_schema.dict()).returning(
+                Product.categories_id).cte('inserted')
+            stmt = _sql.update(Category).where(Category.id == inserted.c.categories_id).values(
+                products_count=Category.products_count + 1)
             try:
-                stmt = _sql.insert(Product).values(**product_schema.dict())
                 await session.execute(stmt)
-                created_product_schema = make_products_read_schema(product_schema)
-                return created_product_schema
-            except:
-                await session.rollback()
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Something not wrong!')
+            except IntegrityError as error:
+                if 'pkey' in violated_constraint(error):
+                    raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail='Product already exists')
+                if 'image' in violated_constraint(error):
+                    raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE,
+                                        detail='Image already used by another product')
+                raise
+            created_product_schema = make_products_read_schema(product_schema)
+            call_after_commit(session, lambda: ProductCache.invalidate(created_product_schema))
+            call_after_commit(session, CatalogVersion.bump)
+            return created_product_schema
 
     @classmethod
-    async def read(cls, product_id: UUID) -> ProductReadSchema:
-        async with get_session() as session:
+    async def read(cls, product_id: UUID, session: AsyncSession | None = None) -> ProductReadSchema:
+        cached_product = await ProductCache.read(product_id)
+        if cached_product:
+            return cached_product
+        async with get_session(session) as session:
             stmt = _sql.select(Product).where(Product.id == product_id)
             request = await session.execute(stmt)
             result = request.scalars().first()
             if not result:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Product not found!')
             product_schema = make_products_read_schema(result)
-            return product_schema
+        await ProductCache.create(product_schema)
+        return product_schema
 
     @classmethod
-    async def delete(cls, product_id: UUID) -> ProductReadSchema:
-        async with get_session() as session:
-            stmt_get = _sql.select(Product).where(Product.id == product_id)
-            request = await session.execute(stmt_get)
-            result = request.scalars().first()
+    async def delete(cls, product_id: UUID, session: AsyncSession | None = None) -> ProductReadSchema:
+        async with get_session(session) as session:
+            # Modifying CTEs always run to completion, the counter is updated though only deleted row is selected
+            deleted = _sql.delete(Product).where(Product.id == product_id).returning(
+                *PRODUCT_STORED_COLUMNS).cte('deleted')
+            counted = _sql.update(Category).where(Category.id == deleted.c.categories_id).values(
+                products_count=Category.products_count - 1).cte('counted')
+            request = await session.execute(_sql.select(deleted).add_cte(counted))
+            result = request.first()
             if not result:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Product not found!')
-            stmt_delete = _sql.delete(Product).where(Product.id == product_id)
-            await session.execute(stmt_delete)
             product_schema = make_products_read_schema(result)
+            call_after_commit(session, lambda: ProductCache.invalidate(product_schema))
+            call_after_commit(session, CatalogVersion.bump)
             return product_schema
 
     @classmethod
-    async def get_all_products(cls, page: int = 1, per_page: int = 10) -> list[ProductReadSchema]:
-        async with get_session() as session:
-            stmt = _sql.select(cls.__db_model).offset((page - 1) * per_page).limit(per_page)
+    async def get_all_products(cls, cursor: str | None = None, per_page: int = 10,
+                               session: AsyncSession | None = None) -> dict:
+        """ Page in ProductPageSchema shape """
+        version, cached_page = await ProductCache.read_page(cursor, per_page)
+        if cached_page:
+            return cached_page
+        async with get_session(session) as session:
+            stmt = keyset_paginate(_sql.select(*PRODUCT_READ_COLUMNS), cls.__db_model, cursor, per_page)
             result = await session.execute(stmt)
-            products = result.scalars().all()
-            return [make_products_read_schema(product) for product in products]
+            products = result.all()
+            page = {'items': rows_as_dicts(products[:per_page], PRODUCT_READ_COLUMNS),
+                    'next_cursor': next_page_cursor(products, per_page)}
+        if version is not None:
+            await ProductCache.create_page(version, cursor, per_page, page)
+        return page
 
     @classmethod
-    async def get_product_by_basket_schemas(cls, basket_schemas: list[BasketReadSchema]) -> list[ProductReadSchema]:
-        ids = [product.products_id for product in basket_schemas]
-        stmt = _sql.select(Product).where(Product.id.in_(ids))
-        async with get_session() as session:
-            result = await session.execute(stmt)
-            payload = result.scalars().all()
-            return [make_products_read_schema(product) for product in payload]
+    async def get_products_by_category(cls, category_id: UUID, cursor: str | None = None, per_page: int = 10,
+                                       session: AsyncSession | None = None) -> dict:
+        """ Page in ProductPageSchema shape """
+        stmt = _sql.select(*PRODUCT_READ_COLUMNS).where(cls.__db_model.categories_id == category_id)
+        async with get_session(session) as session:
+            result = await session.execute(keyset_paginate(stmt, cls.__db_model, cursor, per_page))
+            products = result.all()
+        return {'items': rows_as_dicts(products[:per_page], PRODUCT_READ_COLUMNS),
+                'next_cursor': next_page_cursor(products, per_page)}
+
+    @classmethod
+    async def get_products_by_ids(cls, product_ids: list[UUID], session: AsyncSession | None = None) -> dict:
+        """ Products in request order, cache first and one IN query for the rest. ProductBatchSchema shape """
+        product_ids = list(dict.fromkeys(product_ids))
+        products = await ProductCache.read_many(product_ids)
+        not_cached = [product_id for product_id in product_ids if product_id not in products]
+        if not_cached:
+            stmt = _sql.select(*PRODUCT_READ_COLUMNS).where(cls.__db_model.id.in_(not_cached))
+            async with get_session(session) as session:
+                result = await session.execute(stmt)
+                found = rows_as_dicts(result.all(), PRODUCT_READ_COLUMNS)
+            await ProductCache.create_many(found)
+            products.update((product['id'], product) for product in found)
+        return {'items': [products[product_id] for product_id in product_ids if product_id in products],
+                'missing_ids': [product_id for product_id in product_ids if product_id not in products]}
+
+    @classmethod
+    async def search(cls, search_schema: ProductSearchSchema, cursor: str | None = None, per_page: int = 10,
+                     session: AsyncSession | None = None) -> dict:
+        """ Text match through GIN indexes, filters and keyset paging over (sort column, id).
+        Page in ProductPageSchema shape """
+        stmt = _sql.select(*PRODUCT_READ_COLUMNS, cls.__db_model.effective_price)
+        if search_schema.query:
+            like_pattern = make_like_pattern(search_schema.query)  # Backslash is the default LIKE escape in postgres
+            conditions = [cls.__db_model.title.ilike(like_pattern), cls.__db_model.description.ilike(like_pattern)]
+            tsquery = make_prefix_tsquery(search_schema.query)
+            if tsquery:
+                conditions.append(cls.__db_model.search_vector.op('@@')(_sql.func.to_tsquery('simple', tsquery)))
+            stmt = stmt.where(_sql.or_(*conditions))
+        if search_schema.category_id:
+            stmt = stmt.where(cls.__db_model.categories_id == search_schema.category_id)
+        if search_schema.min_price is not None:
+            stmt = stmt.where(cls.__db_model.price >= search_schema.min_price)
+        if search_schema.max_price is not None:
+            stmt = stmt.where(cls.__db_model.price <= search_schema.max_price)
+        if search_schema.min_effective_price is not None:
+            stmt = stmt.where(cls.__db_model.effective_price >= search_schema.min_effective_price)
+        if search_schema.max_effective_price is not None:
+            stmt = stmt.where(cls.__db_model.effective_price <= search_schema.max_effective_price)
+
+        by_price = search_schema.sort in (ProductSort.cheapest, ProductSort.most_expensive)
+        descending = search_schema.sort in (ProductSort.newest, ProductSort.most_expensive)
+        sort_column = cls.__db_model.effective_price if by_price else cls.__db_model.created_at
+        if cursor:
+            sort_value, record_id = decode_sort_cursor(cursor)
+            try:
+                sort_value = Decimal(sort_value) if by_price else datetime.datetime.fromisoformat(sort_value)
+            except (ArithmeticError, ValueError):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid cursor')
+            sort_key = _sql.tuple_(sort_column, cls.__db_model.id)
+            after = _sql.tuple_(_sql.literal(sort_value, sort_column.type), _sql.literal(record_id))
+            stmt = stmt.where(sort_key < after if descending else sort_key > after)
+        if descending:
+            stmt = stmt.order_by(sort_column.desc(), cls.__db_model.id.desc())
+        else:
+            stmt = stmt.order_by(sort_column, cls.__db_model.id)
+
+        async with get_session(session) as session:
+            result = await session.execute(stmt.limit(per_page + 1))
+            products = result.all()
+        next_cursor = None
+        if len(products) > per_page:
+            last_product = products[per_page - 1]
+            last_value = last_product.effective_price if by_price else last_product.created_at.isoformat()
+            next_cursor = encode_sort_cursor(str(last_value), last_product.id)
+        return {'items': rows_as_dicts(products[:per_page], PRODUCT_READ_COLUMNS), 'next_cursor': next_cursor}
 
 
 class BasketCRUD(BaseCRUD):
     __db_model = Basket
 
     @classmethod
-    async def create(cls, basket_schema: BasketCreateSchema) -> BasketCreateSchema:
-        async with get_session() as session:
-            insert_stmt = _sql.insert(cls.__db_model).values(**basket_schema.dict())
-            await session.execute(insert_stmt)
-            return basket_schema
+    def _returning_columns(cls) -> list:
+        return [cls.__db_model.id, cls.__db_model.products_id, cls.__db_model.users_id, cls.__db_model.quantity]
 
     @classmethod
-    async def read(cls, user_id: UUID, product_id: UUID) -> BasketReadSchema | None:
+    async def create(cls, basket_schema: BasketCreateSchema, session: AsyncSession | None = None) -> BasketReadSchema:
+        """ Insert product into basket or add quantity to existing row, in one statement """
+        product_select = _sql.select(
+            _sql.literal(basket_schema.id), Product.id, _sql.literal(basket_schema.users_id),
+            _sql.literal(basket_schema.quantity)
+        ).where(Product.id == basket_schema.products_id)
+        insert_stmt = pg_insert(cls.__db_model).from_select(
+            ['id', 'products_id', 'users_id', 'quantity'], product_select)
+        upsert_stmt = insert_stmt.on_conflict_do_update(
+            index_elements=[cls.__db_model.users_id, cls.__db_model.products_id],
+            set_={'quantity': cls.__db_model.quantity + insert_stmt.excluded.quantity}
+        ).returning(*cls._returning_columns())
+        async with get_session(session) as session:
+            result = await session.execute(upsert_stmt)
+            payload = result.first()
+            if not payload:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Product not found!')
+            return BasketReadSchema.from_orm(payload)
+
+    @classmethod
+    async def read(cls, user_id: UUID, product_id: UUID,
+                   session: AsyncSession | None = None) -> BasketReadSchema | None:
         stmt = _sql.select(cls.__db_model).where(
             _sql.and_(cls.__db_model.users_id == user_id, cls.__db_model.products_id == product_id))
-        async with get_session() as session:
+        async with get_session(session) as session:
             result = await session.execute(stmt)
             payload = result.scalars().first()
             return BasketReadSchema.from_orm(payload) if payload else None
 
     @classmethod
-    async def update(cls, user_id: UUID, product_id: UUID, quantity: int = 1) -> BasketReadSchema:
-        stmt_select = _sql.select(cls.__db_model).where(
-            _sql.and_(cls.__db_model.users_id == user_id, cls.__db_model.products_id == product_id))
-        async with get_session() as session:
-            result = await session.execute(stmt_select)
-            payload: Basket = result.scalars().first()
-            new_quantity = payload.quantity + quantity
-            if new_quantity < 1:
+    async def update(cls, user_id: UUID, product_id: UUID, quantity: int = 1,
+                     session: AsyncSession | None = None) -> BasketReadSchema:
+        """ Change quantity in place, the row is left untouched if it would drop below one """
+        stmt = _sql.update(cls.__db_model).where(
+            _sql.and_(cls.__db_model.users_id == user_id, cls.__db_model.products_id == product_id,
+                      cls.__db_model.quantity + quantity >= 1)
+        ).values(quantity=cls.__db_model.quantity + quantity).returning(*cls._returning_columns())
+        async with get_session(session) as session:
+            result = await session.execute(stmt)
+            payload = result.first()
+            if not payload:
+                if not await cls.read(user_id, product_id, session=session):
+                    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Product not found in basket')
                 raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail='This is lower quantity')
-            stmt_update = _sql.update(cls.__db_model).where(
-                _sql.and_(cls.__db_model.users_id == user_id, cls.__db_model.products_id == product_id)).values(
-                quantity=new_quantity)
-            await session.execute(stmt_update)
-            payload.quantity = new_quantity
             return BasketReadSchema.from_orm(payload)
 
     @classmethod
-    async def delete(cls, user_id: UUID, product_id: UUID) -> BasketReadSchema | None:
-        select_stmt = _sql.select(cls.__db_model).where(
-            _sql.and_(cls.__db_model.users_id == user_id, cls.__db_model.products_id == product_id))
+    async def delete(cls, user_id: UUID, product_id: UUID,
+                     session: AsyncSession | None = None) -> BasketReadSchema | None:
         delete_stmt = _sql.delete(cls.__db_model).where(
-            _sql.and_(cls.__db_model.users_id == user_id, cls.__db_model.products_id == product_id))
-        async with get_session() as session:
-            result = await session.execute(select_stmt)
-            payload = result.scalars().first()
+            _sql.and_(cls.__db_model.users_id == user_id, cls.__db_model.products_id == product_id)
+        ).returning(*cls._returning_columns())
+        async with get_session(session) as session:
+            result = await session.execute(delete_stmt)
+            payload = result.first()
             if not payload:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Product not found in basket')
-            await session.execute(delete_stmt)
             return BasketReadSchema.from_orm(payload)
 
     @classmethod
-    async def clear_basket(cls, user_id: UUID) -> None:
+    async def clear_basket(cls, user_id: UUID, session: AsyncSession | None = None) -> None:
         stmt = _sql.delete(cls.__db_model).where(cls.__db_model.users_id == user_id)
-        async with get_session() as session:
+        async with get_session(session) as session:
             await session.execute(stmt)
 
     @classmethod
-    async def full_basket(cls, user_id: UUID) -> list[BasketReadSchema]:
-        stmt = _sql.select(cls.__db_model).where(cls.__db_model.users_id == user_id)
-        async with get_session() as session:
+    async def _full_basket(cls, lines: _sql.FromClause, session: AsyncSession | None = None) -> FullBasketSchema:
+        """ Basket lines joined with products, unit prices and totals are computed by postgres in numeric """
+        line_summa = Product.effective_price * lines.c.quantity
+        stmt = _sql.select(
+            *PRODUCT_READ_COLUMNS,
+            lines.c.quantity,
+            Product.effective_price.label('unit_price'),
+            line_summa.label('line_summa'),
+            _sql.func.sum(line_summa).over().label('basket_summa'),
+        ).join(Product, Product.id == lines.c.products_id)
+        async with get_session(session) as session:
             result = await session.execute(stmt)
-            payload = result.scalars().all()
-            parsed_schemas = list(map(lambda basket: BasketReadSchema.from_orm(basket), payload))
-            return parsed_schemas
+            rows = result.all()
+        items = [ProductInfoFromBasket.model_construct(item=construct_products_read_schema(row), quantity=row.quantity,
+                                                       unit_price=row.unit_price, full_summa=row.line_summa)
+                 for row in rows]
+        return FullBasketSchema.model_construct(full_summa=rows[0].basket_summa if rows else Decimal(0), items=items)
+
+    @classmethod
+    async def full_basket(cls, user_id: UUID, session: AsyncSession | None = None) -> FullBasketSchema:
+        lines = _sql.select(cls.__db_model.products_id, cls.__db_model.quantity).where(
+            cls.__db_model.users_id == user_id).subquery()
+        return await cls._full_basket(lines, session=session)
+
+    @classmethod
+    async def full_basket_from_quantities(cls, quantities: dict[UUID, int],
+                                          session: AsyncSession | None = None) -> FullBasketSchema:
+        """ Same as full_basket for lines kept outside the table (redis basket storage) """
+        if not quantities:
+            return FullBasketSchema(full_summa=0, items=[])
+        lines = _sql.values(_sql.column('products_id', _sql.UUID), _sql.column('quantity', _sql.Integer),
+                            name='lines').data(list(quantities.items()))
+        return await cls._full_basket(lines, session=session)
+
+    @classmethod
+    async def read_quantities(cls, user_id: UUID, session: AsyncSession | None = None) -> dict[UUID, int]:
+        stmt = _sql.select(cls.__db_model.products_id, cls.__db_model.quantity).where(
+            cls.__db_model.users_id == user_id)
+        async with get_session(session) as session:
+            result = await session.execute(stmt)
+            return {products_id: quantity for products_id, quantity in result.all()}
+
+    @classmethod
+    async def lock_users(cls, user_ids: list[UUID], session: AsyncSession) -> None:
+        """ Transaction level advisory locks, so concurrent flushes of one basket are applied in order """
+        user_id = _sql.column('user_id')
+        stmt = _sql.select(_sql.func.pg_advisory_xact_lock(_sql.func.hashtextextended(user_id, 0))).select_from(
+            _sql.func.unnest(_sql.cast(sorted(map(str, user_ids)), ARRAY(_sql.Text))).alias('user_id')
+        )
+        await session.execute(stmt)
+
+    @classmethod
+    async def replace_baskets(cls, baskets: dict[UUID, dict[UUID, int]], session: AsyncSession) -> None:
+        """ Overwrite stored baskets of the users with given snapshots """
+        if not baskets:
+            return
+        await session.execute(_sql.delete(cls.__db_model).where(cls.__db_model.users_id.in_(baskets)))
+        rows = [BasketReadSchema.for_line(user_id, product_id, quantity).dict()
+                for user_id, quantities in baskets.items() for product_id, quantity in quantities.items()]
+        if rows:
+            await session.execute(_sql.insert(cls.__db_model), rows)
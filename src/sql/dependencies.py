@@ -0,0 +1,23 @@
+from typing import AsyncGenerator, Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .connect import AsyncSessionLocal
+
+
+def call_after_commit(session: AsyncSession, callback: Callable[[], Awaitable[None]]) -> None:
+    """ Register coroutine (e.g. cache invalidation) to run once the session transaction is committed """
+    session.info.setdefault('after_commit', []).append(callback)
+
+
+async def run_after_commit(session: AsyncSession) -> None:
+    for callback in session.info.pop('after_commit', []):
+        await callback()
+
+
+async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
+    """ One session and transaction per request: committed on success, rolled back on any exception """
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            yield session
+        await run_after_commit(session)
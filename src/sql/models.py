@@ -1,9 +1,7 @@
-from datetime import datetime
-from datetime import timedelta
-from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, UUID, Integer, String, Boolean, DateTime, DECIMAL
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import declarative_base, deferred
+from sqlalchemy import Column, UUID, Integer, String, Boolean, DateTime, DECIMAL, Index, Computed
 
-from services.email.constants import VERIFY_CODE_EXPIRE_DAYS
 
 Base = declarative_base()
 
@@ -20,6 +18,10 @@ class User(Base):
     verified_email = Column(Boolean)
     created_at = Column(DateTime)
 
+    __table_args__ = (
+        Index('ix_users_created_at_id', 'created_at', 'id'),  # Keyset pagination
+    )
+
     def to_dict(self):
         return {
             'id': str(self.id),  # Convert UUID to string
@@ -37,6 +39,11 @@ class Category(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, unique=True, nullable=False)
     title = Column(String(length=30), nullable=False)
     created_at = Column(DateTime)
+    products_count = Column(Integer, nullable=False, default=0, server_default='0')  # Kept by product writes
+
+    __table_args__ = (
+        Index('ix_categories_title', 'title', unique=True),
+    )
 
 
 class Product(Base):
@@ -49,7 +56,23 @@ class Product(Base):
     image = Column(String, unique=True, nullable=True)  # Link to image in static files with store
     discount = Column(Integer, nullable=True)  # Discount for price
     created_at = Column(DateTime)
-    categories_id = Column(UUID(as_uuid=True), nullable=True, index=True)
+    categories_id = Column(UUID(as_uuid=True), nullable=True)
+    # Price after discount, kept by postgres so it can be filtered and sorted by index
+    effective_price = Column(DECIMAL(9, 2), Computed('round(price * (100 - coalesce(discount, 0)) / 100, 2)'))
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+    )))
+
+    __table_args__ = (
+        Index('ix_store_created_at_id', 'created_at', 'id'),  # Keyset pagination
+        Index('ix_store_categories_id_created_at_id', 'categories_id', 'created_at', 'id'),  # Pages of category
+        Index('ix_store_effective_price_id', 'effective_price', 'id'),
+        Index('ix_store_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('ix_store_title_trgm', 'title', postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'}),
+        Index('ix_store_description_trgm', 'description', postgresql_using='gin',
+              postgresql_ops={'description': 'gin_trgm_ops'}),
+    )
 
 
 class Basket(Base):
@@ -57,14 +80,8 @@ class Basket(Base):
     __tablename__ = 'baskets'
     id = Column(UUID(as_uuid=True), primary_key=True, unique=True, nullable=False)
     products_id = Column(UUID(as_uuid=True), index=True)  # ID from "store" table
-    users_id = Column(UUID(as_uuid=True), index=True)  # ID from "users" table
+    users_id = Column(UUID(as_uuid=True))  # ID from "users" table
     quantity = Column(Integer(), nullable=False)  # Product quantity in user basket
-
-
-class VerificationCode(Base):
-    """ Codes to verify email """
-    __tablename__ = 'verification_codes'
-    id = Column(UUID(as_uuid=True), primary_key=True, unique=True, nullable=False)
-    verify_code = Column(DECIMAL(6), nullable=False)
-    users_id = Column(UUID, index=True)
-    expire_to = Column(DateTime, default=lambda: datetime.utcnow() + timedelta(days=VERIFY_CODE_EXPIRE_DAYS))
+    __table_args__ = (
+        Index('ix_baskets_users_id_products_id', 'users_id', 'products_id', unique=True),  # One row per product
+    )
@@ -0,0 +1,38 @@
+import asyncio
+import uuid
+
+from redis.exceptions import ConnectionError
+
+import redis_db.connect
+from redis_db.crud import BasketCache
+from services.basket.storage import RedisBasketStorage
+
+
+def test_dirty_basket_expires_only_after_flush():
+    user_id, product_id = uuid.uuid4(), uuid.uuid4()
+
+    async def change_and_flush(changed_again: bool) -> int:
+        await BasketCache.add(user_id, product_id, 1)
+        assert await BasketCache.pop_dirty(10) == [user_id]
+        if changed_again:
+            await BasketCache.add(user_id, product_id, 1)
+        await BasketCache.expire_flushed([user_id])
+        return await redis_db.connect.redis_client.ttl(BasketCache.basket_key(user_id))
+
+    async def scenario():
+        await BasketCache.load(user_id, {})
+        assert await change_and_flush(changed_again=True) == -1
+        await BasketCache.pop_dirty(10)
+        assert await change_and_flush(changed_again=False) > 0
+
+    asyncio.run(scenario())
+
+
+def test_failed_flush_on_stop_is_logged(monkeypatch, caplog):
+    async def unavailable():
+        raise ConnectionError('Redis is down')
+
+    storage = RedisBasketStorage()
+    monkeypatch.setattr(storage, 'flush', unavailable)
+    asyncio.run(storage.stop())
+    assert 'Basket flush on shutdown failed' in caplog.text
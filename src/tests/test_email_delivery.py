@@ -0,0 +1,117 @@
+"""
+EmailDelivery against a stand-in for smtplib.SMTP: every connection and message is recorded,
+errors are scripted per message.
+"""
+import asyncio
+import smtplib
+
+import pytest
+
+import config
+from services.email.delivery import EmailDelivery
+
+
+class FakeSMTP:
+    connections: list['FakeSMTP'] = []
+    errors: list[Exception | None] = []
+
+    def __init__(self, host, port, timeout=None):
+        self.logins = 0
+        self.sent = []
+        self.closed = False
+        FakeSMTP.connections.append(self)
+
+    def login(self, user, password):
+        self.logins += 1
+
+    def send_message(self, message):
+        error = FakeSMTP.errors.pop(0) if FakeSMTP.errors else None
+        if error is not None:
+            raise error
+        self.sent.append(message['To'])
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fake_smtp(monkeypatch):
+    FakeSMTP.connections = []
+    FakeSMTP.errors = []
+    monkeypatch.setattr(smtplib, 'SMTP', FakeSMTP)
+    monkeypatch.setattr(config, 'SMTP_USE_SSL', False)
+    monkeypatch.setattr(config, 'EMAIL_PASS', 'secret')
+    monkeypatch.setattr(config, 'EMAIL_RETRY_BACKOFF_SECONDS', 0)
+    monkeypatch.setattr(config, 'EMAIL_MAX_RETRIES', 2)
+
+
+def deliver(*recipients: str) -> dict:
+    async def scenario():
+        delivery = EmailDelivery(workers=1, queue_size=100)
+        await delivery.start()
+        for recipient in recipients:
+            delivery.send_verification_code(123456, recipient)
+        await delivery.stop()
+        return delivery.get_statistics()
+
+    return asyncio.run(scenario())
+
+
+def test_connection_is_reused_between_messages():
+    statistics = deliver('a@example.com', 'b@example.com', 'c@example.com')
+    assert len(FakeSMTP.connections) == 1
+    connection = FakeSMTP.connections[0]
+    assert connection.logins == 1
+    assert connection.sent == ['a@example.com', 'b@example.com', 'c@example.com']
+    assert connection.closed
+    assert statistics['sent'] == 3
+    assert statistics['failed'] == 0
+    assert statistics['retries'] == 0
+    assert statistics['max_latency'] >= statistics['average_latency'] > 0
+
+
+def test_transient_error_is_retried_over_new_connection():
+    FakeSMTP.errors = [smtplib.SMTPServerDisconnected('Connection unexpectedly closed')]
+    statistics = deliver('a@example.com', 'b@example.com')
+    assert len(FakeSMTP.connections) == 2
+    assert FakeSMTP.connections[1].sent == ['a@example.com', 'b@example.com']
+    assert statistics['sent'] == 2
+    assert statistics['retries'] == 1
+    assert statistics['failed'] == 0
+
+
+def test_temporary_reply_is_retried_until_limit():
+    FakeSMTP.errors = [smtplib.SMTPDataError(451, b'Try again later')] * 3
+    statistics = deliver('a@example.com')
+    assert statistics['sent'] == 0
+    assert statistics['failed'] == 1
+    assert statistics['retries'] == 2
+
+
+@pytest.mark.parametrize('error', [smtplib.SMTPRecipientsRefused({'a@example.com': (550, b'No such user')}),
+                                   smtplib.SMTPSenderRefused(553, b'Not allowed', 'shop@example.com'),
+                                   smtplib.SMTPDataError(554, b'Rejected')])
+def test_permanent_error_fails_at_once(error):
+    FakeSMTP.errors = [error]
+    statistics = deliver('a@example.com', 'b@example.com')
+    assert len(FakeSMTP.connections) == 1
+    assert FakeSMTP.connections[0].sent == ['b@example.com']
+    assert statistics['sent'] == 1
+    assert statistics['failed'] == 1
+    assert statistics['retries'] == 0
+
+
+def test_failed_login_is_not_retried(monkeypatch):
+    def refuse(self, user, password):
+        raise smtplib.SMTPAuthenticationError(535, b'Bad credentials')
+
+    monkeypatch.setattr(FakeSMTP, 'login', refuse)
+    statistics = deliver('a@example.com')
+    assert len(FakeSMTP.connections) == 1
+    assert FakeSMTP.connections[0].closed
+    assert statistics['failed'] == 1
+    assert statistics['retries'] == 0
+
@@ -0,0 +1,28 @@
+import datetime
+import json
+import uuid
+from decimal import Decimal
+
+from services.orders.export import csv_chunk, ndjson_chunk
+
+
+def make_order() -> dict:
+    return {'id': uuid.uuid4(), 'username': 'buyer', 'created': datetime.datetime(2024, 1, 2, 3, 4, 5),
+            'post_index': 10001, 'status': 'Processing', 'total': Decimal('0.30'),
+            'items': [{'product_id': uuid.uuid4(), 'title': 'Teapot', 'unit_price': Decimal('0.10'), 'quantity': 3,
+                       'total': Decimal('0.30')}]}
+
+
+def test_ndjson_keeps_amounts_exact():
+    order = make_order()
+    exported = json.loads(ndjson_chunk([order]))
+    assert exported['id'] == str(order['id'])
+    assert exported['created'] == '2024-01-02T03:04:05'
+    assert exported['total'] == '0.30'
+    assert exported['items'][0]['unit_price'] == '0.10'
+
+
+def test_csv_has_row_per_item_with_details():
+    lines = csv_chunk([make_order()], details=True, header=True).decode().splitlines()
+    assert lines[0].endswith('unit_price,quantity,item_total')
+    assert lines[1].endswith('Teapot,0.10,3,0.30')
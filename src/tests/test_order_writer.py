@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette import status
+
+from mongo.crud import MongoCRUD
+from services.orders.writer import OrderWriteBuffer
+
+
+def test_unconfirmed_orders_get_503_on_stop(monkeypatch):
+    async def never_acknowledged(documents):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(MongoCRUD, 'create_many', never_acknowledged)
+
+    async def scenario():
+        buffer = OrderWriteBuffer(writers=1, batch_size=2, flush_interval=0, queue_size=10)
+        await buffer.start()
+        writes = [asyncio.create_task(buffer.write({'number': number})) for number in range(5)]
+        await asyncio.sleep(0.01)
+        await buffer.stop(timeout=0.01)
+        return await asyncio.wait_for(asyncio.gather(*writes, return_exceptions=True), timeout=1)
+
+    results = asyncio.run(scenario())
+    assert len(results) == 5
+    for result in results:
+        assert isinstance(result, HTTPException)
+        assert result.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+
+def test_write_after_stop_is_refused():
+    async def scenario():
+        buffer = OrderWriteBuffer(writers=1)
+        await buffer.start()
+        await buffer.stop()
+        with pytest.raises(HTTPException) as error:
+            await buffer.write({})
+        assert error.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+    asyncio.run(scenario())
@@ -0,0 +1,33 @@
+import io
+import uuid
+
+import pytest
+
+from services.store.importer import describe_error, parse_product_row, read_rows
+from services.store.schemas import ImportFormat
+
+
+def make_row(price) -> dict:
+    return {'title': 'Teapot', 'price': price, 'image': 'teapot.png', 'category_id': str(uuid.uuid4())}
+
+
+@pytest.mark.parametrize('price, expected', [('10.5', 10.5), ('10.50', 10.5), (' 7 ', 7.0), (12, 12.0)])
+def test_price_is_kept_exactly(price, expected):
+    assert parse_product_row(make_row(price)).price == expected
+
+
+@pytest.mark.parametrize('price', ['1.005', '10.123', '1e2', 'nan', 'abc'])
+def test_malformed_price_is_a_row_error(price):
+    with pytest.raises(Exception) as error:
+        parse_product_row(make_row(price))
+    assert describe_error(error.value) == 'Price must be a number with at most two decimal places.'
+
+
+def test_ndjson_prices_are_read_as_written():
+    category_id = str(uuid.uuid4()).encode()
+    lines = [b'{"title": "Teapot", "price": 1.005, "image": "teapot.png", "category_id": "%s"}' % category_id,
+             b'{"title": "Teapot", "price": 1e2, "image": "teapot.png", "category_id": "%s"}' % category_id]
+    rows = [row for _, row in read_rows(io.BytesIO(b'\n'.join(lines)), ImportFormat.ndjson)]
+    for row in rows:
+        with pytest.raises(Exception):
+            parse_product_row(row)
@@ -0,0 +1,172 @@
+"""
+Admin and registration writes are single statements: every operation below must send exactly one query.
+Needs postgres with pg_trgm, set TEST_DATABASE_URL to an empty database.
+"""
+import asyncio
+import os
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+import sql.crud
+from services.auth.schemas import UserCreateSchema
+from services.store.schemas import CategoryCreateSchema, ProductCreateSchema
+from sql.crud import CategoryCRUD, ProductCRUD, UserCRUD
+from sql.models import Base
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL is not set')
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements: list[str] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+def run(operation):
+    """ Runs operation(session) in its own transaction, returns its result and the statements it sent """
+    async def scenario():
+        engine = create_async_engine(TEST_DATABASE_URL, poolclass=NullPool)
+        counter = QueryCounter()
+        try:
+            async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+                async with session.begin():
+                    event.listen(engine.sync_engine, 'before_cursor_execute', counter)
+                    try:
+                        return await operation(session), counter.statements
+                    finally:
+                        event.remove(engine.sync_engine, 'before_cursor_execute', counter)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(scenario())
+
+
+@pytest.fixture(scope='module', autouse=True)
+def database():
+    async def create_schema(drop: bool):
+        engine = create_async_engine(TEST_DATABASE_URL, poolclass=NullPool)
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
+            if not drop:
+                await connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+                await connection.run_sync(Base.metadata.create_all)
+        await engine.dispose()
+
+    asyncio.run(create_schema(drop=False))
+    yield
+    asyncio.run(create_schema(drop=True))
+
+
+@pytest.fixture(autouse=True)
+def fast_hashing(monkeypatch):
+    async def hash_password(password: str) -> str:
+        return f'hashed-{password}'
+
+    monkeypatch.setattr(sql.crud, 'hash_password', hash_password)
+
+
+def create_user() -> uuid.UUID:
+    name = f'user{uuid.uuid4().hex[:12]}'
+    user_schema = UserCreateSchema(username=name, password='Password1', email=f'{name}@example.com')
+    user, statements = run(lambda session: UserCRUD.create(user_schema, session=session))
+    assert len(statements) == 1
+    return user.id
+
+
+def test_user_create_is_one_query():
+    create_user()
+
+
+def test_user_create_conflict_is_one_query():
+    name = f'user{uuid.uuid4().hex[:12]}'
+    run(lambda session: UserCRUD.create(UserCreateSchema(username=name, password='Password1',
+                                                         email=f'{name}@example.com'), session=session))
+    duplicate = UserCreateSchema(username=name, password='Password1', email=f'other-{name}@example.com')
+
+    async def create(session):
+        try:
+            await UserCRUD.create(duplicate, session=session)
+        except HTTPException as error:
+            return error
+
+    error, statements = run(create)
+    assert error.detail == 'Username already exists'
+    assert len(statements) == 1
+
+
+@pytest.mark.parametrize('operation', [UserCRUD.ban_user, UserCRUD.verifying_user, UserCRUD.delete])
+def test_user_write_is_one_query(operation):
+    user_id = create_user()
+    user, statements = run(lambda session: operation(user_id, session=session))
+    assert user.id == user_id
+    assert len(statements) == 1
+
+
+def test_unban_is_one_query():
+    user_id = create_user()
+    run(lambda session: UserCRUD.ban_user(user_id, session=session))
+    user, statements = run(lambda session: UserCRUD.unban_user(user_id, session=session))
+    assert user.active
+    assert len(statements) == 1
+
+
+@pytest.mark.parametrize('operation', [UserCRUD.ban_user, UserCRUD.verifying_user])
+def test_missing_user_is_one_query(operation):
+    async def change(session):
+        with pytest.raises(HTTPException) as error:
+            await operation(uuid.uuid4(), session=session)
+        assert error.value.status_code == 404
+        assert not session.info.get('after_commit')
+
+    _, statements = run(change)
+    assert len(statements) == 1
+
+
+def test_category_and_product_writes_are_one_query_each():
+    category = CategoryCreateSchema(title=f'cat-{uuid.uuid4().hex[:8]}')
+    _, statements = run(lambda session: CategoryCRUD.create(category, session=session))
+    assert len(statements) == 1
+
+    product = ProductCreateSchema(id=uuid.uuid4(), title='Teapot', description=None, price='10.50',
+                                  image='teapot.png', categories_id=category.id)
+    _, statements = run(lambda session: ProductCRUD.create(product, session=session))
+    assert len(statements) == 1
+
+    deleted, statements = run(lambda session: ProductCRUD.delete(product.id, session=session))
+    assert deleted.id == product.id
+    assert len(statements) == 1
+
+    _, statements = run(lambda session: CategoryCRUD.delete(category.id, session=session))
+    assert len(statements) == 1
+
+
+
+@pytest.mark.parametrize('duplicate, detail', [('id', 'Product already exists'),
+                                               ('image', 'Image already used by another product')])
+def test_product_conflict_is_one_query(duplicate, detail):
+    def make_product(**fields) -> ProductCreateSchema:
+        return ProductCreateSchema(**{'id': uuid.uuid4(), 'title': 'Teapot', 'description': None, 'price': '10.50',
+                                      'image': f'{uuid.uuid4().hex}.png', 'categories_id': uuid.uuid4(), **fields})
+
+    product = make_product()
+    run(lambda session: ProductCRUD.create(product, session=session))
+    conflicting = make_product(**{duplicate: getattr(product, duplicate)})
+
+    async def create(session):
+        with pytest.raises(HTTPException) as error:
+            await ProductCRUD.create(conflicting, session=session)
+        assert error.value.status_code == 406
+        return error.value.detail
+
+    result, statements = run(create)
+    assert result == detail
+    assert len(statements) == 1
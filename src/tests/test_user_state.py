@@ -0,0 +1,44 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from redis.exceptions import ConnectionError
+from starlette import status
+
+import redis_db.crud
+from redis_db.crud import UserStateCache
+from services.auth.constants import USER_STATE_MARK_ATTEMPTS
+
+
+def test_token_issued_before_change_is_not_trusted():
+    user_id = uuid.uuid4()
+
+    async def scenario():
+        issued_at = int(time.time()) - 1
+        assert not await UserStateCache.changed_since(user_id, issued_at)
+        await UserStateCache.mark_changed(user_id)
+        assert await UserStateCache.changed_since(user_id, issued_at)
+        assert not await UserStateCache.changed_since(user_id, int(time.time()) + 1)
+
+    asyncio.run(scenario())
+
+
+def test_failed_mark_is_retried_and_reported(monkeypatch, caplog):
+    attempts = []
+
+    async def unavailable(*args, **kwargs):
+        attempts.append(args)
+        raise ConnectionError('Redis is down')
+
+    async def no_sleep(delay):
+        pass
+
+    monkeypatch.setattr(redis_db.crud.redis_client, 'set', unavailable)
+    monkeypatch.setattr(redis_db.crud.asyncio, 'sleep', no_sleep)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(UserStateCache.mark_changed(uuid.uuid4()))
+    assert error.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert len(attempts) == USER_STATE_MARK_ATTEMPTS
+    assert 'not revoked' in caplog.text
@@ -0,0 +1,83 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from starlette import status
+
+from redis_db.crud import VerifyCodeStore
+from services.auth.schemas import UserReadSchema
+from services.email import service
+from services.email.delivery import email_delivery
+
+
+def make_user() -> UserReadSchema:
+    return UserReadSchema(id=uuid.uuid4(), username='buyer', email='buyer@example.com', verified_email=False,
+                          active=True, admin=False, created_at='2024-01-01T00:00:00')
+
+
+class Outbox:
+    """ Stand-in for the delivery queue, remembers codes and fails while it is full """
+
+    def __init__(self):
+        self.codes: list[int] = []
+        self.full = False
+
+    def send_verification_code(self, code: int, to_email: str) -> None:
+        self.codes.append(code)
+        if self.full:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail='Too many emails in queue')
+
+
+@pytest.fixture
+def outbox(monkeypatch) -> Outbox:
+    outbox = Outbox()
+    monkeypatch.setattr(email_delivery, 'send_verification_code', outbox.send_verification_code)
+    return outbox
+
+
+def test_resend_is_throttled(outbox):
+    user = make_user()
+
+    async def scenario():
+        await service.send_new_code(user)
+        with pytest.raises(HTTPException) as error:
+            await service.send_new_code(user)
+        assert error.value.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+    asyncio.run(scenario())
+    assert len(outbox.codes) == 1
+
+
+def test_failed_delivery_can_be_retried_at_once(outbox):
+    user = make_user()
+
+    async def scenario():
+        outbox.full = True
+        with pytest.raises(HTTPException) as error:
+            await service.send_new_code(user)
+        assert error.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        orphaned_code = outbox.codes[-1]
+        with pytest.raises(HTTPException) as error:
+            await VerifyCodeStore.check(user.id, orphaned_code)
+        assert error.value.detail == 'Code invalid or expired, please request a new code'
+
+        outbox.full = False
+        await service.send_new_code(user)
+        await VerifyCodeStore.check(user.id, outbox.codes[-1])
+
+    asyncio.run(scenario())
+    assert len(outbox.codes) == 2
+
+
+def test_code_is_single_use(outbox):
+    user = make_user()
+
+    async def scenario():
+        await service.send_new_code(user)
+        await VerifyCodeStore.check(user.id, outbox.codes[-1])
+        with pytest.raises(HTTPException) as error:
+            await VerifyCodeStore.check(user.id, outbox.codes[-1])
+        assert error.value.status_code == status.HTTP_403_FORBIDDEN
+
+    asyncio.run(scenario())